@@ -0,0 +1,19 @@
+"""
+Benchmarks for stacksprout, run from the repository root:
+
+    python -m benchmarks                      # every suite, full sizes
+    python -m benchmarks layout --quick       # one suite, sizes up to 100k
+    python -m benchmarks --out base.json      # machine-readable results
+    python -m benchmarks compare base.json new.json
+
+Suites:
+    tracer  -- per-call overhead of @trace against the plain function;
+               fails the run when a sink= trace written from a thread
+               pool raises or loses calls
+    layout  -- grid / tidy layout time and peak memory, 1k to 1M calls
+    frames  -- per-frame cost of animate, cull_canvas, zoom and the
+               level-of-detail renderer on a stub canvas (--tk for a real
+               Tk canvas, e.g. under Xvfb)
+    imports -- time to import the tracer in a fresh interpreter; fails the
+               run when over budget or when it loads Tk/numpy/Pillow
+"""
@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+
+from . import bench_frames, bench_imports, bench_layout, bench_tracer
+from .harness import compare, write_results
+
+SUITES = {
+    "tracer": bench_tracer.run,
+    "layout": bench_layout.run,
+    "frames": bench_frames.run,
+    "imports": bench_imports.run,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="python -m benchmarks compare")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.10, help="ratio above 1 + threshold is a regression")
+        args = parser.parse_args(argv[1:])
+        return 1 if compare(args.old, args.new, args.threshold) else 0
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, fewer repeats")
+    parser.add_argument("--tk", action="store_true", help="frames suite on a real Tk canvas (needs a display, e.g. Xvfb)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite {unknown[0]!r} (choose from {', '.join(SUITES)})")
+
+    results = []
+    for name in args.suites or SUITES:
+        if name == "frames":
+            found = SUITES[name](quick=args.quick, real_tk=args.tk)
+        else:
+            found = SUITES[name](quick=args.quick)
+        for entry in found:
+            print(json.dumps(entry))
+        results.extend(found)
+
+    if args.out:
+        write_results(args.out, results)
+
+    failures = bench_imports.budget_failures(results) + bench_tracer.sink_failures(results)
+    for failure in failures:
+        print(f"failed: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Per-frame cost of animation steps, culling, zoom and the LOD renderer."""
+import random
+import time
+
+from stacksprout.animation import animate
+from stacksprout.interactions import cull_canvas, on_zoom, refresh_view
+from stacksprout.metrics import ViewMetrics
+from stacksprout.scene import VIEW
+
+from .harness import frame_stats, result, timed
+from .stub_canvas import item_count, make_context
+from .workloads import synthetic_trace
+
+# eager drawing is used up to 5000 calls, the LOD renderer above
+EAGER_SIZES = (1_000, 5_000)
+LOD_SIZES = (100_000, 1_000_000)
+QUICK_LOD_SIZES = (100_000,)
+
+def phase_ms(metrics):
+    """The startup phases the window reported, as result metrics."""
+    return {f"{name}_ms": ms for name, ms in metrics.report()["startup_ms"].items()}
+
+class WheelEvent:
+    def __init__(self, delta, x=400, y=300):
+        self.delta = delta
+        self.x = x
+        self.y = y
+
+def sample(frames, step):
+    """Run step(i) for every frame i, return the per-frame times in ns."""
+    samples = []
+    for i in range(frames):
+        start = time.perf_counter_ns()
+        step(i)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+def zoom_frame(context, zoom_config):
+    def step(i):
+        # ten wheel clicks in, ten out, then settle as the debounced callback would
+        on_zoom(WheelEvent(120 if i % 20 < 10 else -120), context, zoom_config)
+        refresh_view(context)
+    return step
+
+def pan_frame(context):
+    def step(i):
+        VIEW["tx"] -= 40 if i % 40 < 20 else -40
+        refresh_view(context)
+    return step
+
+def run(quick=False, real_tk=False):
+    rng = random.Random(1)
+    frames = 100 if quick else 300
+    results = []
+
+    for n in EAGER_SIZES:
+        store = synthetic_trace("skewed", n)
+        metrics = ViewMetrics()
+        (context, zoom_config), elapsed = timed(lambda: make_context(store, real_tk=real_tk, metrics=metrics))
+        context.metrics = None
+        params = {"shape": "skewed", "calls": n, "canvas": "tk" if real_tk else "stub"}
+        results.append(
+            result("frames", "open", params, time_ms=elapsed / 1e6, items=item_count(context.canvas), **phase_ms(metrics))
+        )
+
+        context.mode["view_mode"] = 1
+        context.anim.rendered = None
+        _, elapsed = timed(lambda: animate(context))
+        results.append(result("frames", "animate_resync", params, time_ms=elapsed / 1e6))
+
+        def step_forward(i):
+            context.anim.step()
+            animate(context)
+        context.anim.cursor = 1
+        results.append(result("frames", "animate_step", params, **frame_stats(sample(frames, step_forward))))
+
+        events = context.anim.threshold
+        def scrub(i):
+            context.anim.cursor = rng.randint(1, events)
+            animate(context)
+        results.append(result("frames", "animate_scrub", params, **frame_stats(sample(frames, scrub))))
+
+        def cull(i):
+            VIEW["tx"] -= 40 if i % 40 < 20 else -40
+            cull_canvas(context.canvas)
+        results.append(result("frames", "cull_canvas", params, **frame_stats(sample(frames, cull))))
+        results.append(result("frames", "zoom", params, **frame_stats(sample(frames, zoom_frame(context, zoom_config)))))
+
+    for n in QUICK_LOD_SIZES if quick else LOD_SIZES:
+        store = synthetic_trace("skewed", n)
+        metrics = ViewMetrics()
+        (context, zoom_config), elapsed = timed(
+            lambda: make_context(store, layout="tidy", real_tk=real_tk, metrics=metrics)
+        )
+        context.metrics = None
+        params = {"shape": "skewed", "calls": n, "canvas": "tk" if real_tk else "stub", "layout": "tidy"}
+        results.append(
+            result("frames", "open_lod", params, time_ms=elapsed / 1e6, items=item_count(context.canvas), **phase_ms(metrics))
+        )
+        results.append(result("frames", "lod_zoom", params, **frame_stats(sample(frames, zoom_frame(context, zoom_config)))))
+        results.append(result("frames", "lod_pan", params, **frame_stats(sample(frames, pan_frame(context)))))
+        results.append(result("frames", "lod_items", params, items=item_count(context.canvas)))
+    return results
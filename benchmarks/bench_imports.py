@@ -0,0 +1,75 @@
+"""Import time of the package in a fresh interpreter, against a budget."""
+import json
+import os
+import subprocess
+import sys
+
+from .harness import result
+
+# `from stacksprout import trace` takes 12-16 ms on CPython 3.11 here (best
+# of 3, 22 new modules); the budget leaves room for slower machines but not
+# for a GUI or layout import sneaking back in
+IMPORT_BUDGET_MS = 30
+# never loaded by the tracer (inspect alone would add ~18 ms)
+HEAVY_MODULES = ("tkinter", "_tkinter", "ctypes", "numpy", "PIL", "inspect")
+
+PROBE = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter_ns()
+{statement}
+elapsed = time.perf_counter_ns() - start
+print(json.dumps({{"ns": elapsed, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+STATEMENTS = {
+    "trace": "from stacksprout import trace",
+    "visualize_tree": "import stacksprout; stacksprout.visualize_tree",
+}
+
+def import_cost(statement, repeat):
+    """Fastest (ns, new modules) of `repeat` fresh interpreters running `statement`, None if it fails."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    best = None
+    for _ in range(repeat):
+        run = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement)],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if run.returncode != 0:
+            return None
+        probe = json.loads(run.stdout)
+        if best is None or probe["ns"] < best["ns"]:
+            best = probe
+    return best
+
+def run(quick=False):
+    repeat = 3 if quick else 10
+    results = []
+    for name, statement in STATEMENTS.items():
+        cost = import_cost(statement, repeat)
+        if cost is None:  # e.g. no Tk on this machine
+            continue
+        modules = cost["modules"]
+        metrics = {"import_ms": cost["ns"] / 1e6, "modules": len(modules)}
+        if name == "trace":
+            metrics["budget_ms"] = IMPORT_BUDGET_MS
+            metrics["heavy_modules"] = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+        results.append(result("imports", "import", {"name": name}, **metrics))
+    return results
+
+def budget_failures(results):
+    """Messages for every import over its budget or loading a heavy module."""
+    failures = []
+    for entry in results:
+        metrics = entry["metrics"]
+        if entry["suite"] != "imports" or "budget_ms" not in metrics:
+            continue
+        if metrics["import_ms"] > metrics["budget_ms"]:
+            failures.append(f"{entry['params']['name']}: {metrics['import_ms']:.1f} ms > {metrics['budget_ms']} ms budget")
+        if metrics["heavy_modules"]:
+            failures.append(f"{entry['params']['name']}: loads {', '.join(metrics['heavy_modules'])}")
+    return failures
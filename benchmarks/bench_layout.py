@@ -0,0 +1,55 @@
+"""Layout time and peak memory on synthetic wide, deep and skewed traces."""
+from stacksprout.geometry import Geometry
+from stacksprout.layout import LayoutEngine
+from stacksprout.tidy_layout import tidy_layout
+from stacksprout.tree_to_grid import generate_basic_tree_grid, center_tree_grid, grid_layout
+
+from .harness import peak_memory, result, timed
+from .workloads import SHAPES, synthetic_trace
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (1_000, 10_000, 100_000)
+
+def phases(parent, call_info):
+    """(name, setup) pairs: setup() runs what the phase needs and returns the step to measure."""
+    def setup_basic():
+        return lambda: generate_basic_tree_grid(parent, call_info)
+
+    def setup_centre():
+        grid, pos, postorder, _ = generate_basic_tree_grid(parent, call_info)
+        return lambda: center_tree_grid(grid, parent, pos, postorder)
+
+    def setup_grid():
+        return lambda: grid_layout(parent, call_info)
+
+    def setup_tidy():
+        return lambda: tidy_layout(parent, call_info)
+
+    def setup_geometry():
+        tree_layout = tidy_layout(parent, call_info)
+        engine = LayoutEngine(tree_layout, 50, 30)
+        engine.compute_centering(800, 600)
+        return lambda: Geometry(tree_layout, parent, engine)
+
+    return [
+        ("generate_basic_tree_grid", setup_basic),
+        ("center_tree_grid", setup_centre),
+        ("grid_layout", setup_grid),
+        ("tidy_layout", setup_tidy),
+        ("geometry", setup_geometry),
+    ]
+
+def run(quick=False):
+    results = []
+    for shape in SHAPES:
+        for n in QUICK_SIZES if quick else SIZES:
+            store = synthetic_trace(shape, n)
+            for name, setup in phases(store.parent, store.call_info):
+                _, elapsed = timed(setup())
+                peak = peak_memory(setup())
+                results.append(result(
+                    "layout", name, {"shape": shape, "calls": n},
+                    time_ms=elapsed / 1e6,
+                    peak_mb=peak / 1e6,
+                ))
+    return results
@@ -0,0 +1,145 @@
+"""
+Per-call overhead of @trace against the undecorated function, and a check
+that a sink= trace written from a thread pool holds every call.
+"""
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from stacksprout import trace, load_trace, TraceSession
+
+from .harness import best_of, result
+from .workloads import fib, factorial, tree_sum, balanced_tree
+
+VARIANTS = {
+    "default": {},
+    "compact": {"compact": True},
+    "timing": {"timing": "wall"},
+    # a directory, filled in by run; each workload writes its own file there
+    "sink": {"sink": None},
+}
+
+def traced_workloads(options):
+    """The workloads again, recursing through a traced wrapper."""
+    def traced(func):
+        if "sink" in options:
+            return trace(**{**options, "sink": os.path.join(options["sink"], f"{func.__name__}.sst")})(func)
+        return trace(**options)(func)
+
+    @traced
+    def t_fib(n):
+        if n <= 1:
+            return 1
+        return t_fib(n - 1) + t_fib(n - 2)
+
+    @traced
+    def t_factorial(n):
+        if n == 0:
+            return 1
+        return n * t_factorial(n - 1)
+
+    @traced
+    def t_tree_sum(node):
+        if node is None:
+            return 0
+        return node.value + t_tree_sum(node.left) + t_tree_sum(node.right)
+
+    return {"fib": t_fib, "factorial": t_factorial, "tree_sum": t_tree_sum}
+
+def run(quick=False):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+    repeat = 3 if quick else 5
+    inputs = {
+        "fib": (fib, 18 if quick else 22),
+        "factorial": (factorial, 800),
+        "tree_sum": (tree_sum, balanced_tree(12 if quick else 15)),
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant, options in VARIANTS.items():
+            if "sink" in options:
+                options = {**options, "sink": tmp}
+            traced = traced_workloads(options)
+            for name, (plain, arg) in inputs.items():
+                plain_ns = best_of(lambda: plain(arg), repeat)
+                traced_ns = best_of(lambda: traced[name](arg), repeat)
+                calls = len(traced[name].call_info)
+                params = {"workload": name, "variant": variant, "calls": calls}
+                results.append(result(
+                    "tracer", "overhead", params,
+                    plain_ns_per_call=plain_ns / calls,
+                    traced_ns_per_call=traced_ns / calls,
+                    overhead_ns_per_call=(traced_ns - plain_ns) / calls,
+                ))
+            if "sink" in options:
+                # the sink sessions map their last file; let go of it before tmp is removed
+                for func in traced.values():
+                    func.trace_store.clear()
+                    func.trace_store.finish()
+    results.append(sink_threads(jobs=64 if quick else 256))
+    return results
+
+def sink_threads(jobs, workers=8, n=12):
+    """
+    `jobs` fib(n) calls on a thread pool, once as roots of their own and
+    once under one traced call, streamed to a sink file. Every call of the
+    second run must be in its file, and the first run's file must hold
+    whole roots; no call may raise.
+    """
+    per_job = 2 * fib(n) - 1
+    errors = []
+    with tempfile.TemporaryDirectory() as tmp:
+        session = TraceSession(sink=os.path.join(tmp, "threads.sst"))
+
+        @session.trace
+        def t_fib(n):
+            if n <= 1:
+                return 1
+            return t_fib(n - 1) + t_fib(n - 2)
+
+        @session.trace
+        def t_pool(k):
+            with ThreadPoolExecutor(workers) as pool:
+                return list(pool.map(job, [n] * k))
+
+        def job(k):
+            try:
+                return t_fib(k)
+            except Exception as e:
+                errors.append(repr(e))
+
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(job, [n] * jobs))
+        with load_trace(session.store.path) as saved:
+            roots_calls = len(saved)
+        t_pool(jobs)
+        with load_trace(session.store.path) as saved:
+            pooled_calls = len(saved)
+            unfinished = sum(1 for u in saved.call_info if saved.call_info[u]["out_time"] is None)
+
+    params = {"workload": "fib", "workers": workers, "jobs": jobs, "calls": 1 + jobs * per_job}
+    return result(
+        "tracer", "sink_threads", params,
+        errors=errors[:5],
+        error_count=len(errors),
+        pooled_calls=pooled_calls,
+        unfinished=unfinished,
+        partial_roots=roots_calls % per_job,
+    )
+
+def sink_failures(results):
+    """Messages for a sink_threads check that raised, lost calls or left calls unfinished."""
+    failures = []
+    for entry in results:
+        if entry["suite"] != "tracer" or entry["name"] != "sink_threads":
+            continue
+        metrics = entry["metrics"]
+        if metrics["error_count"]:
+            failures.append(f"sink_threads: {metrics['error_count']} calls raised, e.g. {metrics['errors'][0]}")
+        if metrics["pooled_calls"] != entry["params"]["calls"]:
+            failures.append(f"sink_threads: {metrics['pooled_calls']} of {entry['params']['calls']} calls in the file")
+        if metrics["unfinished"] or metrics["partial_roots"]:
+            failures.append("sink_threads: the file holds unfinished calls")
+    return failures
@@ -0,0 +1,105 @@
+"""Timing, memory and result-file helpers shared by the suites."""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+def best_of(fn, repeat=5):
+    """Fastest of `repeat` runs of fn(), in ns."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        best = min(best, time.perf_counter_ns() - start)
+    return best
+
+def timed(fn):
+    """(result of fn(), elapsed ns) for a single run."""
+    start = time.perf_counter_ns()
+    value = fn()
+    return value, time.perf_counter_ns() - start
+
+def peak_memory(fn):
+    """Peak bytes allocated by Python while fn() runs (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def frame_stats(samples_ns):
+    """Summary of per-frame times, in µs."""
+    samples = sorted(samples_ns)
+    return {
+        "frames": len(samples),
+        "median_us": statistics.median(samples) / 1e3,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] / 1e3,
+        "max_us": samples[-1] / 1e3,
+    }
+
+def result(suite, name, params, **metrics):
+    return {"suite": suite, "name": name, "params": params, "metrics": metrics}
+
+def metadata():
+    try:
+        from importlib.metadata import version
+        package_version = version("stacksprout")
+    except Exception:
+        package_version = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "stacksprout": package_version,
+        "commit": commit,
+        "numpy": numpy_version,
+    }
+
+def write_results(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+def _key(entry):
+    return entry["suite"], entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+def compare(old_path, new_path, threshold=0.10):
+    """Print new/old ratios of every metric both files have; returns the regressions."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {_key(e): e for e in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    regressions = []
+    for entry in new:
+        before = old.get(_key(entry))
+        if before is None:
+            continue
+        for metric, value in entry["metrics"].items():
+            was = before["metrics"].get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(was, (int, float)) or not was:
+                continue
+            ratio = value / was
+            flag = ""
+            # every metric is a cost (time, bytes, items): higher is worse
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append((entry["suite"], entry["name"], entry["params"], metric, ratio))
+            print(f"{entry['suite']:7} {entry['name']:24} {json.dumps(entry['params']):40} {metric:16} x{ratio:6.2f}{flag}")
+    return regressions
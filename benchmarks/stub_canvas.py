@@ -0,0 +1,125 @@
+"""
+A Tk-free stand-in for the canvas and widgets, so the visualizer's frame
+code can be timed without a display. Drawing methods only count the items
+created; times measured with it are the Python side of a frame only.
+"""
+
+class StubCanvas:
+    def __init__(self, width=800, height=600):
+        self.width = width
+        self.height = height
+        self.items = 0  # items created so far
+        self._after = 0
+
+    def _create(self, *args, **kwargs):
+        self.items += 1
+        return self.items
+
+    create_oval = create_text = create_line = create_rectangle = _create
+
+    def _noop(self, *args, **kwargs):
+        pass
+
+    itemconfigure = itemconfig = dtag = addtag_withtag = coords = move = scale = _noop
+    delete = tag_lower = tag_raise = tag_bind = bind = pack = _noop
+
+    def find_withtag(self, tag):
+        return ()
+
+    def gettags(self, item):
+        return ()
+
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def cget(self, key):
+        return {"width": self.width, "height": self.height}[key]
+
+    def after(self, ms, callback):
+        self._after += 1
+        return self._after
+
+    def after_cancel(self, job):
+        pass
+
+class StubFont:
+    def __init__(self, size):
+        self.size = size
+
+    def measure(self, text):
+        return len(text) * self.size * 0.6
+
+    def configure(self, size=None):
+        if size is not None:
+            self.size = size
+
+    def cget(self, key):
+        return self.size
+
+    def metrics(self, key):
+        return self.size * 2
+
+class StubWidget:
+    def __init__(self, value=0):
+        self.value = value
+
+    def configure(self, **options):
+        pass
+
+    config = configure
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+def item_count(canvas):
+    """Items on a stub or real canvas."""
+    return canvas.items if isinstance(canvas, StubCanvas) else len(canvas.find_all())
+
+def make_context(source, layout="grid", real_tk=False, metrics=None):
+    """A drawn _VisualizationContext for `source`, plus its zoom limits."""
+    from stacksprout.visualizer import _VisualizationContext, build_graph
+
+    context = _VisualizationContext()
+    context.metrics = metrics
+    cell_offset, diameter = 30, 50
+    if real_tk:
+        import tkinter as tk
+        import tkinter.font as tkfont
+        root = tk.Tk()
+        root.withdraw()
+        context.canvas = tk.Canvas(root, width=800, height=600)
+        medium = tkfont.Font(family="Segoe UI", size=diameter // 5)
+        small = tkfont.Font(family="Segoe UI", size=diameter // 7)
+        ui_font = tkfont.Font(family="Segoe UI", size=10)
+    else:
+        context.canvas = StubCanvas()
+        medium, small, ui_font = StubFont(diameter // 5), StubFont(diameter // 7), StubFont(10)
+
+    context.style.update(
+        canvas_font_medium=medium,
+        canvas_font_small=small,
+        ui_font_medium=ui_font,
+        bg_color="#f2f2ff",
+        base_font_medium=medium.cget("size"),
+        base_font_small=small.cget("size"),
+    )
+    context.ui.update(
+        play_button=StubWidget(),
+        anim_speed_scale=StubWidget(300),
+        anim_timeline_scrub_var=StubWidget(),
+        timeline_scrub_label=StubWidget(),
+    )
+    zoom_config = build_graph(context, source, layout, diameter, cell_offset, 800, 600)
+    return context, zoom_config
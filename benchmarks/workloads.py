@@ -0,0 +1,73 @@
+"""Recursive workloads and synthetic call trees of any size and shape."""
+from itertools import count
+
+from stacksprout.trace_store import ColumnarTrace
+
+# ---- workloads in the style of examples/ ----
+
+def fib(n):
+    if n <= 1:
+        return 1
+    return fib(n - 1) + fib(n - 2)
+
+def factorial(n):
+    if n == 0:
+        return 1
+    return n * factorial(n - 1)
+
+class Node:
+    def __init__(self, value, left=None, right=None):
+        self.value = value
+        self.left = left
+        self.right = right
+
+def tree_sum(node):
+    if node is None:
+        return 0
+    return node.value + tree_sum(node.left) + tree_sum(node.right)
+
+def balanced_tree(depth, value=1):
+    if depth == 0:
+        return None
+    return Node(value, balanced_tree(depth - 1, 2 * value), balanced_tree(depth - 1, 2 * value + 1))
+
+# ---- synthetic traces ----
+
+SHAPES = ("wide", "deep", "skewed")
+
+def split(shape, remaining):
+    """Sizes of the child subtrees of a call with `remaining` calls below it."""
+    if remaining == 0:
+        return []
+    if shape == "deep":
+        return [remaining]
+    if shape == "wide":
+        k = min(32, remaining)
+        return [remaining // k + (1 if i < remaining % k else 0) for i in range(k)]
+    # skewed: binary, 90% of the calls go left
+    right = remaining // 10
+    return [remaining - right, right] if right else [remaining]
+
+def synthetic_trace(shape, n):
+    """
+    A finished trace of exactly n calls in a compact store, recorded in the
+    order a real run would produce (depth first, enter/exit times).
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of {SHAPES}, got {shape!r}")
+    store = ColumnarTrace()
+    name = store.intern(shape)
+    clock = count(1)
+
+    stack = [(None, n, 1)]
+    while stack:
+        item = stack.pop()
+        if len(item) == 1:
+            store.end(item[0], None, next(clock))
+            continue
+        parent_id, size, depth = item
+        call_id = store.begin(parent_id, name, (size,), next(clock), depth)
+        stack.append((call_id,))
+        for sub in reversed(split(shape, size - 1)):
+            stack.append((call_id, sub, depth + 1))
+    return store
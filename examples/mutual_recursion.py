@@ -0,0 +1,18 @@
+from stacksprout import TraceSession, visualize_tree
+
+session = TraceSession("parity")
+
+@session.trace
+def is_even(n):
+    if n == 0:
+        return True
+    return is_odd(n - 1)
+
+@session.trace
+def is_odd(n):
+    if n == 0:
+        return False
+    return is_even(n - 1)
+
+is_even(6)
+visualize_tree(session)
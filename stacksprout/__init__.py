@@ -1,4 +1,38 @@
-from .tracer import trace
-from .visualizer import visualize_tree
+"""
+Record recursive calls as call trees and look at them.
 
-__all__ = ["trace", "visualize_tree"]
+The tracer imports with the standard library only. Everything else,
+from trace files, region capture and the timeline index to what draws
+(Tk, layouts, exporters), is loaded the first time one of its names is
+used, so `from stacksprout import trace` stays cheap and works without Tk.
+"""
+from importlib import import_module
+
+from .tracer import trace, TraceSession
+from .timing import TimeProfile
+
+# name -> module that defines it, imported on first access
+_LAZY = {
+    "capture": ".region",
+    "save_trace": ".trace_file",
+    "load_trace": ".trace_file",
+    "TimelineIndex": ".timeline",
+    "CallDag": ".dedupe",
+    "visualize_tree": ".visualizer",
+    "ViewMetrics": ".metrics",
+    "export_tree": ".export",
+    "export_animation": ".animation_export",
+}
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+__all__ = ["trace", "TraceSession", "capture", "visualize_tree", "save_trace", "load_trace", "TimelineIndex", "CallDag", "TimeProfile", "ViewMetrics", "export_tree", "export_animation"]
@@ -1,3 +1,9 @@
+from .scene import NODE_ITEMS, EDGE_ITEMS
+from .timeline import node_state
+
+NODE_STATES = ("future", "active", "completed")
+NODE_SUFFIXES = ("oval", "label1", "label2")
+
 class AnimationController:
     def __init__(self, context, events_len):
         self.context = context
@@ -6,6 +12,9 @@ class AnimationController:
         self.cursor = 1
         self.threshold = events_len
 
+        # cursor the canvas currently shows, None = unknown (full redraw)
+        self.rendered = None
+
         # previously context.animation
         self.playing = False
         self.after_id = None
@@ -72,75 +81,128 @@ def sync_timeline_ui(ui, timer):
     ui["timeline_scrub_label"].configure(
         text=f"Time step: {cursor} / {threshold}"
     )
-def show_all_nodes_active(canvas, graph_config):
+def show_all_nodes(canvas, graph_config, state):
+    """Put every node and edge in `state` with a handful of tag-wide Tk calls."""
     # Nodes
-    canvas.dtag("node", "future_node_oval")
-    canvas.dtag("node", "completed_node_oval")
-    canvas.dtag("node", "future_node_label1")
-    canvas.dtag("node", "completed_node_label1")
-    canvas.dtag("node", "future_node_label2")
-    canvas.dtag("node", "completed_node_label2")
-
-    canvas.addtag_withtag("active_node_oval", "node")
-    canvas.addtag_withtag("active_node_label1", "node")
-    canvas.addtag_withtag("active_node_label2", "node")
+    for other in NODE_STATES:
+        if other != state:
+            for suffix in NODE_SUFFIXES:
+                canvas.dtag("node", f"{other}_node_{suffix}")
+    for suffix in NODE_SUFFIXES:
+        canvas.addtag_withtag(f"{state}_node_{suffix}", "node")
 
     # Edges
-    canvas.dtag("edge", "future_edge")
-    canvas.dtag("edge", "completed_edge")
-    canvas.addtag_withtag("active_edge", "edge")
+    for other in NODE_STATES:
+        if other != state:
+            canvas.dtag("edge", f"{other}_edge")
+    canvas.addtag_withtag(f"{state}_edge", "edge")
 
     update_animation_nodes(canvas, graph_config)
+def show_all_nodes_active(canvas, graph_config):
+    show_all_nodes(canvas, graph_config, "active")
+def item_kind(tag):
+    """Item kind tag ("oval", "label1", "label2", "edge") a graph_config entry styles."""
+    return tag.rsplit("_", 1)[-1]
 def update_animation_nodes(canvas, graph_config):
+    # every node item carries all three "<state>_node_<suffix>" tags,
+    # so each entry is narrowed to the item kind it styles
     for tag, options in graph_config.items():
-        for item in canvas.find_withtag(tag):
-            item_type = canvas.type(item)
-
-            safe_options = {}
-            for k, v in options.items():
-                if k == "outline" and item_type == "oval":
-                    safe_options[k] = v
-                elif k == "fill" and item_type == "text":
-                    safe_options[k] = v
-                elif k == "fill" and item_type in ("text", "line"):
-                    safe_options[k] = v
-
-            if safe_options:
-                canvas.itemconfigure(item, **safe_options)
+        canvas.itemconfigure(f"({tag})&&{item_kind(tag)}", **options)
+def set_node_state(context, node_id, old, new):
+    """Restyle one node and the edge into it, touching only its own items."""
+    canvas = context.canvas
+    graph_config = context.ui["graph_config"]
+
+    # nodes outside the level-of-detail view have no items
+    items = NODE_ITEMS.get(node_id, ())
+    for item in items:
+        for suffix in NODE_SUFFIXES:
+            canvas.dtag(item, f"{old}_node_{suffix}")
+            canvas.addtag_withtag(f"{new}_node_{suffix}", item)
+    style_node_items(context, node_id, items, new)
+
+    edge = EDGE_ITEMS.get(node_id)
+    if edge is not None:
+        canvas.dtag(edge, f"{old}_edge")
+        canvas.addtag_withtag(f"{new}_edge", edge)
+        canvas.itemconfigure(edge, **graph_config[f"{new}_edge"])
+def style_node_items(context, node_id, items, state):
+    """Apply the graph_config colours of `state` to a node's (oval, label1, label2) items."""
+    if not items:
+        return
+    canvas = context.canvas
+    graph_config = context.ui["graph_config"]
+
+    oval_options = dict(graph_config[f"{state}_node_oval"])
+    if state != "future":
+        name = context.call_info[node_id]["name"]
+        oval_options["fill"] = context.style.get("function_fills", {}).get(name, context.style["bg_color"])
+    canvas.itemconfigure(items[0], **oval_options)
+    for item, suffix in zip(items[1:], NODE_SUFFIXES[1:]):
+        canvas.itemconfigure(item, **graph_config[f"{state}_node_{suffix}"])
+def restart_near(context, old_p, p):
+    """
+    Put the full drawing in the state of the first or the last event when
+    that cursor is nearer to `p` than `old_p`; returns the cursor shown.
+    """
+    timeline = context.timeline
+    end = len(timeline)
+    if p < abs(p - old_p) and p <= end - p:
+        show_all_nodes(context.canvas, context.ui["graph_config"], "future")
+        return 0
+    if end - p < abs(p - old_p):
+        show_all_nodes(context.canvas, context.ui["graph_config"], "completed")
+        # calls that never returned are still running after the last event
+        for node_id in timeline.active_at(end):
+            set_node_state(context, node_id, "completed", "active")
+        return end
+    return old_p
 def animate(context):
-    p = context.anim.cursor
-
-    for info in context.call_info.values():
-        node_id = info["self_id"]
-        t_in = info["in_time"]
-        t_out = info["out_time"]
-
-        if p < t_in:
-            state = "future"
-        elif p < t_out:
-            state = "active"
-        else:
-            state = "completed"
-
-        for item in context.canvas.find_withtag(f"node_{node_id}"):
-            context.canvas.dtag(item, "future_node_oval")
-            context.canvas.dtag(item, "active_node_oval")
-            context.canvas.dtag(item, "completed_node_oval")
-            context.canvas.dtag(item, "future_node_label1")
-            context.canvas.dtag(item, "active_node_label1")
-            context.canvas.dtag(item, "completed_node_label1")
-            context.canvas.dtag(item, "future_node_label2")
-            context.canvas.dtag(item, "active_node_label2")
-            context.canvas.dtag(item, "completed_node_label2")
-
-            for suffix in ("oval", "label1", "label2"):
-                context.canvas.addtag_withtag(f"{state}_node_{suffix}", item)
-        
-        for item in context.canvas.find_withtag(f"edge_{node_id}"):
-            context.canvas.dtag(item, "future_edge")
-            context.canvas.dtag(item, "active_edge")
-            context.canvas.dtag(item, "completed_edge")
-            context.canvas.addtag_withtag(f"{state}_edge", item)
+    """
+    Move the canvas from the cursor it shows to `context.anim.cursor`.
+
+    Cursor p means the first p events of `context.timeline` have happened.
+    Only calls with an event between the two cursors change state, so a
+    step costs O(changed nodes) no matter how large the trace is. In the
+    level-of-detail view a jump longer than a timeline checkpoint interval
+    redraws the visible nodes at the new cursor instead, which costs
+    O(visible nodes) however far the scrubber moved.
+
+    The full drawing can be put in the state of the first or the last
+    event with a few tag-wide calls (show_all_nodes). A long jump starts
+    from whichever of those is nearer to the new cursor than the shown
+    one, so scrubbing back from the end touches the calls of the events
+    before the new cursor, not of every event in between.
+    """
+    metrics = context.metrics
+    if metrics is not None:
+        start = metrics.clock()
+
+    anim = context.anim
+    timeline = context.timeline
+    p = anim.cursor
+
+    if anim.rendered is None:
+        show_all_nodes(context.canvas, context.ui["graph_config"], "future")
+        anim.rendered = 0
+
+    old_p = anim.rendered
+    if context.lod is not None and abs(p - old_p) > timeline.checkpoint_every:
+        context.lod.render()
+    elif old_p != p:
+        if abs(p - old_p) > timeline.checkpoint_every:
+            old_p = restart_near(context, old_p, p)
+        before = timeline.time_at(old_p)
+        now = timeline.time_at(p)
+
+        for node_id in timeline.changed_between(old_p, p):
+            info = context.call_info[node_id]
+            old = node_state(info, before)
+            new = node_state(info, now)
+            if old != new:
+                set_node_state(context, node_id, old, new)
+
+    anim.rendered = p
 
     # update timeline scrubber for sync
     sync_timeline_ui(
@@ -148,4 +210,5 @@ def animate(context):
         {"cursor": context.anim.cursor, "threshold": context.anim.threshold}
     )
 
-    update_animation_nodes(context.canvas, context.ui["graph_config"])
\ No newline at end of file
+    if metrics is not None:
+        metrics.record_frame("animate", metrics.clock() - start)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Offline export of the call animation - no Tk, no display.
+
+The enter/exit timeline is walked in steps of `stride` events. One bitmap
+is kept and, per frame, only the calls whose state changed since the
+previous frame (and the edges into them) are drawn over it, so a frame
+costs O(changed calls). Calls that start and finish within one stride go
+straight to "completed". Needs Pillow (`pip install stacksprout[png]`).
+"""
+import math
+import os
+
+from .export import TreeDrawing, PngWriter, BG_COLOR, MIN_TEXT_PX
+from .timeline import TimelineIndex, node_state
+
+# (oval outline, label, edge) colours per state, as in the window's graph_config
+STATE_COLORS = {
+    "future": (BG_COLOR, BG_COLOR, BG_COLOR),
+    "active": ("#333", "black", "black"),
+    "completed": ("#999", "#666", "#999"),
+}
+
+ANIMATIONS = {
+    ".gif": "GIF",
+    ".png": "PNG",  # APNG
+}
+
+def frame_cursors(events, stride):
+    """Timeline cursors to draw: every `stride` events, always ending on the last."""
+    return [min(p, events) for p in range(stride, events + stride, stride)]
+
+def export_animation(
+    func,
+    path,
+    stride=None,
+    max_frames=300,
+    coalesce=True,
+    duration_ms=100,
+    layout="grid",
+    scale=None,
+    max_size=1024,
+    margin=20,
+):
+    """
+    Write the animation of the trace recorded on `func` to `path`: an
+    animated GIF (".gif"), an APNG (".png") or, for a path without a
+    suffix, a directory of numbered PNG frames.
+
+    Each frame advances `stride` events; by default the stride is chosen
+    so there are at most `max_frames` frames. With `coalesce`, frames in
+    which nothing visible changed are dropped and the previous frame is
+    shown for longer instead. `scale` defaults to fitting the tree into
+    `max_size` pixels. GIF/APNG hold the (palette) frames until they are
+    written; a frame directory keeps memory flat.
+    """
+    suffix = os.path.splitext(os.fspath(path))[1].lower()
+    if suffix and suffix not in ANIMATIONS:
+        raise ValueError(f"cannot export an animation to {suffix!r}; use one of {tuple(ANIMATIONS)} or a directory")
+
+    drawing = TreeDrawing(func, layout, margin)
+    if scale is None:
+        scale = min(1.0, max_size / max(drawing.width, drawing.height))
+
+    timeline = TimelineIndex(drawing.call_info)
+    events = len(timeline)
+    if stride is None:
+        stride = max(1, math.ceil(events / max_frames))
+    elif stride < 1:
+        raise ValueError(f"stride must be at least 1, got {stride!r}")
+
+    call_info = drawing.call_info
+    parent = func.parent
+    geometry = drawing.geometry
+    index = drawing.tree_layout.index
+    xs = geometry.xs.tolist()
+    ys = geometry.ys.tolist()
+    r = geometry.radius
+    labels = drawing.size1 * scale >= MIN_TEXT_PX
+
+    # palette mode: the handful of colours fit, and frames take 1 byte/pixel
+    writer = PngWriter(None, scale, mode="P")
+    writer.begin(drawing.width, drawing.height)
+    if not suffix:
+        os.makedirs(path, exist_ok=True)
+
+    frames = []
+    durations = []
+    rendered = 0
+    for p in frame_cursors(events, stride):
+        before = timeline.time_at(rendered)
+        now = timeline.time_at(p)
+        changed = []
+        for u in timeline.changed_between(rendered, p):
+            new = node_state(call_info[u], now)
+            if u in index and node_state(call_info[u], before) != new:
+                changed.append((u, new))
+        rendered = p
+
+        if not changed and coalesce and durations:
+            durations[-1] += duration_ms
+            continue
+
+        # edges first, so the circles redrawn after them cover their ends
+        for u, state in changed:
+            pu = parent[u]
+            if pu is None or pu not in index:
+                continue
+            i, j = index[u], index[pu]
+            dx = xs[i] - xs[j]
+            dy = ys[i] - ys[j]
+            dist = math.hypot(dx, dy) or 1.0
+            ox, oy = dx / dist * r, dy / dist * r
+            writer.edge(xs[j] + ox, ys[j] + oy, xs[i] - ox, ys[i] - oy, color=STATE_COLORS[state][2])
+
+        for u, state in changed:
+            i = index[u]
+            outline, text, _ = STATE_COLORS[state]
+            fill = BG_COLOR if state == "future" else drawing.fill(u)
+            label1, label2 = drawing.labels(u) if labels else ("", "")
+            writer.node(
+                xs[i], ys[i], r, fill, label1, label2, drawing.size1, drawing.size2, outline=outline, text=text
+            )
+
+        if suffix:
+            frames.append(writer.image.copy())
+        else:
+            writer.image.save(os.path.join(path, f"frame_{len(durations):05d}.png"))
+        durations.append(duration_ms)
+
+    if suffix:
+        frames[0].save(
+            path,
+            format=ANIMATIONS[suffix],
+            save_all=True,
+            append_images=frames[1:],
+            duration=durations,
+            loop=0,
+        )
+    writer.close()
+    return path
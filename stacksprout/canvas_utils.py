@@ -1,3 +1,24 @@
+from .scene import VIEW
+
+def world_viewport(canvas, margin=0):
+    """Visible canvas area grown by `margin` pixels, in world (draw-time) coordinates."""
+    scale = VIEW["scale"]
+    # before the window is mapped winfo_* report 1, use the requested size
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+    if width <= 1 or height <= 1:
+        width = int(canvas.cget("width"))
+        height = int(canvas.cget("height"))
+    vx0 = canvas.canvasx(0) - margin
+    vy0 = canvas.canvasy(0) - margin
+    vx1 = vx0 + width + 2 * margin
+    vy1 = vy0 + height + 2 * margin
+    return (
+        (vx0 - VIEW["tx"]) / scale,
+        (vy0 - VIEW["ty"]) / scale,
+        (vx1 - VIEW["tx"]) / scale,
+        (vy1 - VIEW["ty"]) / scale,
+    )
 def create_circle(canvas, cx, cy, r, **kwargs):
     return canvas.create_oval(
         cx - r, cy - r,
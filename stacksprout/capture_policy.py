@@ -0,0 +1,87 @@
+import weakref
+
+class CapturedRepr(str):
+    """
+    A value recorded as text. Its repr is the text itself, so a tuple of
+    captured args prints like the original tuple would.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return str(self)
+
+class WeakCapture:
+    """A weak reference to a recorded value that prints like the value while it lives."""
+
+    __slots__ = ("_ref", "_type")
+
+    def __init__(self, ref, type_name):
+        self._ref = ref
+        self._type = type_name
+
+    def get(self):
+        return self._ref()
+
+    def __repr__(self):
+        value = self._ref()
+        return f"<collected {self._type}>" if value is None else repr(value)
+
+    def __str__(self):
+        value = self._ref()
+        return f"<collected {self._type}>" if value is None else str(value)
+
+# values that are cheap to keep and never pin anything large
+_SCALARS = (int, float, complex, bool, type(None))
+
+def repr_capture(max_len=40):
+    """Policy: keep repr(value), cut to `max_len` characters."""
+    def capture(value):
+        if isinstance(value, _SCALARS):
+            return value
+        text = repr(value)
+        if len(text) > max_len:
+            text = text[:max(0, max_len - 3)] + "..."
+        return CapturedRepr(text)
+    return capture
+
+def summary_capture(value):
+    """Policy: keep scalars, replace everything else by its type (and length if sized)."""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, str) and len(value) <= 20:
+        return value
+    name = type(value).__name__
+    try:
+        return CapturedRepr(f"<{name} len={len(value)}>")
+    except TypeError:
+        return CapturedRepr(f"<{name}>")
+
+def weakref_capture(value):
+    """Policy: keep a weak reference where the type allows one, a summary otherwise."""
+    if isinstance(value, _SCALARS):
+        return value
+    try:
+        return WeakCapture(weakref.ref(value), type(value).__name__)
+    except TypeError:
+        return summary_capture(value)
+
+CAPTURE_POLICIES = {
+    "repr": repr_capture(),
+    "summary": summary_capture,
+    "weakref": weakref_capture,
+}
+
+def resolve_capture(capture):
+    """
+    Turn the `capture=` argument of `trace` into a per-value function.
+    Accepts None (keep live objects), a policy name or any callable.
+    """
+    if capture is None or callable(capture):
+        return capture
+    try:
+        return CAPTURE_POLICIES[capture]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f"capture must be None, a callable or one of {tuple(CAPTURE_POLICIES)}, got {capture!r}"
+        ) from None
@@ -0,0 +1,110 @@
+"""
+Hash-consing of repeated subcalls.
+
+Two calls are the same subproblem when they have the same function, the
+same arguments and children that are, in order, the same subproblems.
+Every distinct subproblem gets one class id, computed bottom-up in one
+pass, so `fib(n - 2)` recomputed all over a fib trace collapses into a
+single class with a multiplicity count.
+"""
+
+def arg_key(name, args):
+    """Hashable key for (function, args); unhashable args are keyed by repr."""
+    try:
+        key = (name, args)
+        hash(key)
+        return key
+    except TypeError:
+        return (name, repr(args))
+
+def call_label(info):
+    """First node label: the function and its first argument; zero-argument calls (e.g. from capture) show `name()`."""
+    return f"{info['name']}({info['args'][0]})" if info["args"] else f"{info['name']}()"
+
+def result_label(info, count=1):
+    """Second node label: the result, led by how often the subtree occurs when shared."""
+    return f"{info['result']}" if count <= 1 else f"×{count}: {info['result']}"
+
+class CallDag:
+    """
+    Compressed view of a trace: one call per distinct subproblem.
+
+    `parent` / `call_info` hold only the first call of every class, hung
+    under the first call that reached it, so a CallDag can be passed to
+    visualize_tree or export_tree like a traced function. `multiplicity`
+    maps each kept call to the number of calls in its class. The summary
+    attributes tell how much memoization would save: with a cache keyed by
+    (function, args) only `memo_calls` calls would be made (every distinct
+    subproblem once, plus a cache hit for each repeated child call).
+    """
+
+    def __init__(self, parent, call_info, name="trace"):
+        self.__name__ = f"{name} (deduplicated)"
+
+        children = {}
+        roots = []
+        for u, p in parent.items():
+            if p is None:
+                roots.append(u)
+            else:
+                children.setdefault(p, []).append(u)
+        roots.sort()
+        for kids in children.values():
+            kids.sort()
+
+        # breadth-first order, so walking it backwards meets children first
+        order = list(roots)
+        for u in order:
+            order.extend(children.get(u, ()))
+
+        classes = {}  # (function, args, child classes) -> class id
+        class_of = {}
+        counts = []
+        child_calls = []  # class id -> number of child calls of one instance
+        for u in reversed(order):
+            info = call_info[u]
+            kids = children.get(u, ())
+            key = (arg_key(info["name"], info["args"]), tuple(class_of[c] for c in kids))
+            k = classes.get(key)
+            if k is None:
+                k = classes[key] = len(counts)
+                counts.append(0)
+                child_calls.append(len(kids))
+            counts[k] += 1
+            class_of[u] = k
+        del classes
+
+        # keep the first call of each class, depth first in call order
+        self.parent = {}
+        self.call_info = {}
+        self.multiplicity = {}
+        seen = set()
+        stack = [(u, None) for u in reversed(roots)]
+        while stack:
+            u, p = stack.pop()
+            k = class_of[u]
+            if k in seen:
+                continue
+            seen.add(k)
+            self.parent[u] = p
+            self.call_info[u] = call_info[u]
+            self.multiplicity[u] = counts[k]
+            stack.extend((c, u) for c in reversed(children.get(u, ())))
+
+        self.total_calls = len(order)
+        self.distinct_calls = len(counts)
+        self.memo_calls = len(roots) + sum(child_calls)
+
+    @property
+    def memo_savings(self):
+        """Share of the recorded calls a (function, args) cache would avoid."""
+        if not self.total_calls:
+            return 0.0
+        return 1 - self.memo_calls / self.total_calls
+
+    def summary(self):
+        return (
+            f"{self.total_calls} calls, {self.distinct_calls} distinct subproblems; "
+            f"memoization would make {self.memo_calls} calls "
+            f"({self.memo_savings:.2%} fewer)"
+        )
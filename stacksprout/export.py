@@ -0,0 +1,270 @@
+"""
+Headless export of a call tree to SVG or PNG - no Tk, no display.
+
+The calls are placed with the same layouts and LayoutEngine as the
+interactive view and drawn as it shows them in static mode. SVG elements
+are written to the file as they are produced, so only the layout arrays
+are held in memory. PNG output needs Pillow (`pip install
+stacksprout[png]`).
+"""
+import math
+import os
+from xml.sax.saxutils import escape
+
+from .canvas_utils import trim_text_to_width
+from .dedupe import call_label, result_label
+from .geometry import Geometry
+from .graph_renderer import FUNCTION_FILLS
+from .layout import LayoutEngine
+from .placement import place_calls
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+BG_COLOR = "#f2f2ff"
+NODE_OUTLINE = "#333"
+TEXT_COLOR = "black"
+EDGE_COLOR = "black"
+ARROW_SHAPE = (10, 12, 5)  # same as the canvas arrows
+MIN_TEXT_PX = 5  # smaller labels are left out of bitmaps
+FONT_FAMILY = "Segoe UI, Helvetica, Arial, sans-serif"
+
+class _TextMetrics:
+    """Stand-in for a Tk font: estimates text width from the font size."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def measure(self, text):
+        return len(text) * self.size * 0.6
+
+def arrow_head(x1, y1, x2, y2):
+    """Tk-style arrow at (x2, y2): the neck point and the 4-point outline."""
+    d1, d2, d3 = ARROW_SHAPE
+    dx = x2 - x1
+    dy = y2 - y1
+    dist = math.hypot(dx, dy) or 1.0
+    ux, uy = dx / dist, dy / dist
+    neck = (x2 - ux * d1, y2 - uy * d1)
+    back_x, back_y = x2 - ux * d2, y2 - uy * d2
+    points = [
+        (x2, y2),
+        (back_x - uy * d3, back_y + ux * d3),
+        neck,
+        (back_x + uy * d3, back_y - ux * d3),
+    ]
+    return neck, points
+
+class SvgWriter:
+    def __init__(self, path, scale=1.0):
+        self.path = path
+        self.scale = scale
+        self.file = None
+
+    def begin(self, width, height):
+        self.file = open(self.path, "w", encoding="utf-8")
+        w = self.file.write
+        w('<?xml version="1.0" encoding="UTF-8"?>\n')
+        w(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * self.scale:.0f}" '
+            f'height="{height * self.scale:.0f}" viewBox="0 0 {width:.0f} {height:.0f}">\n'
+        )
+        w(f'<rect width="100%" height="100%" fill="{BG_COLOR}"/>\n')
+
+    def begin_edges(self):
+        self.file.write(f'<g stroke="{EDGE_COLOR}" stroke-width="2" fill="{EDGE_COLOR}">\n')
+
+    def edge(self, x1, y1, x2, y2):
+        (nx, ny), points = arrow_head(x1, y1, x2, y2)
+        outline = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+        self.file.write(
+            f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{nx:.1f}" y2="{ny:.1f}"/>'
+            f'<polygon stroke="none" points="{outline}"/>\n'
+        )
+
+    def begin_nodes(self):
+        self.file.write(f'</g>\n<g stroke-width="2" font-family="{FONT_FAMILY}" fill="{TEXT_COLOR}">\n')
+
+    def node(self, cx, cy, r, fill, label1, label2, size1, size2):
+        w = self.file.write
+        w(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r:g}" fill="{fill}" stroke="{NODE_OUTLINE}"/>')
+        if label1:
+            w(
+                f'<text x="{cx:.1f}" y="{cy:.1f}" font-size="{size1:g}" text-anchor="middle" '
+                f'dominant-baseline="central">{escape(label1)}</text>'
+            )
+        if label2:
+            w(
+                f'<text x="{cx:.1f}" y="{cy + r / 2:.1f}" font-size="{size2:g}" text-anchor="middle" '
+                f'dominant-baseline="central">{escape(label2)}</text>'
+            )
+        w("\n")
+
+    def end(self):
+        self.file.write("</g>\n</svg>\n")
+        self.file.close()
+
+    def close(self):
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+
+class PngWriter:
+    def __init__(self, path, scale=1.0, mode="RGB"):
+        if Image is None:
+            raise ImportError('PNG export needs Pillow: pip install "stacksprout[png]"')
+        self.path = path
+        self.scale = scale
+        self.mode = mode
+        self.image = None
+        self.draw = None
+        self.fonts = {}
+
+    def begin(self, width, height):
+        size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        self.image = Image.new(self.mode, size, BG_COLOR)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def _font(self, size):
+        size = round(size * self.scale)
+        if size < MIN_TEXT_PX:
+            return None
+        font = self.fonts.get(size)
+        if font is None:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:  # Pillow < 10.1 has a single bitmap font
+                font = ImageFont.load_default()
+            self.fonts[size] = font
+        return font
+
+    def begin_edges(self):
+        pass
+
+    def edge(self, x1, y1, x2, y2, color=EDGE_COLOR):
+        s = self.scale
+        (nx, ny), points = arrow_head(x1, y1, x2, y2)
+        self.draw.line((x1 * s, y1 * s, nx * s, ny * s), fill=color, width=max(1, round(2 * s)))
+        self.draw.polygon([(x * s, y * s) for x, y in points], fill=color)
+
+    def begin_nodes(self):
+        pass
+
+    def node(self, cx, cy, r, fill, label1, label2, size1, size2, outline=NODE_OUTLINE, text=TEXT_COLOR):
+        s = self.scale
+        self.draw.ellipse(
+            ((cx - r) * s, (cy - r) * s, (cx + r) * s, (cy + r) * s),
+            fill=fill,
+            outline=outline,
+            width=max(1, round(2 * s)),
+        )
+        font = self._font(size1)
+        if label1 and font is not None:
+            self.draw.text((cx * s, cy * s), label1, fill=text, font=font, anchor="mm")
+        font = self._font(size2)
+        if label2 and font is not None:
+            self.draw.text((cx * s, (cy + r / 2) * s), label2, fill=text, font=font, anchor="mm")
+
+    def end(self):
+        self.image.save(self.path, format="PNG")
+
+    def close(self):
+        self.image = None
+        self.draw = None
+
+WRITERS = {
+    ".svg": SvgWriter,
+    ".png": PngWriter,
+}
+
+class TreeDrawing:
+    """
+    Everything needed to draw a trace off screen: the laid-out geometry
+    in image coordinates, the image size, function fills and node labels.
+    """
+
+    cell_offset, diameter = 30, 50
+    size1 = diameter // 5 * 1.5  # the canvas fonts' point sizes at Tk scaling 1.5
+    size2 = diameter // 7 * 1.5
+
+    def __init__(self, func, layout="grid", margin=20):
+        if not hasattr(func, "parent") or not hasattr(func, "call_info"):
+            raise RuntimeError("Function is not traced. Use decorator 'trace'.")
+        if not func.parent or not func.call_info:
+            raise ValueError("No calls were traced. Try running the function.")
+        self.call_info = func.call_info
+        self.multiplicity = getattr(func, "multiplicity", {})  # set on a CallDag
+
+        diameter = self.diameter
+        self.tree_layout = tree_layout = place_calls(func.parent, self.call_info, layout)
+        engine = LayoutEngine(tree_layout, diameter, self.cell_offset)
+        step = diameter + self.cell_offset
+        min_row, min_col = min(tree_layout.rows), min(tree_layout.cols)
+        engine.offset_x = margin - min_col * step
+        engine.offset_y = margin - min_row * step
+        self.width = (max(tree_layout.cols) - min_col) * step + diameter + 2 * margin
+        self.height = (max(tree_layout.rows) - min_row) * step + diameter + 2 * margin
+        self.geometry = Geometry(tree_layout, func.parent, engine)
+
+        # colour nodes by function only when there is more than one
+        fills = {}
+        for u in self.geometry.ids:
+            name = self.call_info[u]["name"]
+            if name not in fills:
+                fills[name] = FUNCTION_FILLS[len(fills) % len(FUNCTION_FILLS)]
+        self.fills = fills if len(fills) > 1 else {}
+
+        self._metrics1 = _TextMetrics(self.size1)
+        self._metrics2 = _TextMetrics(self.size2)
+        self._label2_width = math.floor(diameter * math.sqrt(3) / 2)
+
+    def fill(self, u):
+        return self.fills.get(self.call_info[u]["name"], BG_COLOR)
+
+    def labels(self, u):
+        """(label1, label2) of call u, trimmed to the circle like the canvas labels."""
+        info = self.call_info[u]
+        label1 = trim_text_to_width(call_label(info), self._metrics1, self.diameter)
+        label2 = trim_text_to_width(result_label(info, self.multiplicity.get(u, 1)), self._metrics2, self._label2_width)
+        return label1, label2
+
+def export_tree(func, path, layout="grid", scale=1.0, margin=20):
+    """
+    Draw the call tree recorded on `func` (a traced function, a
+    TraceSession or a loaded trace) to `path`, without opening a window.
+
+    The format follows the file suffix: ".svg", or ".png" with Pillow
+    installed. `layout` is the same as for visualize_tree. `scale` sizes
+    the output image (a PNG is a bitmap of the whole tree, so lower it for
+    very large traces); `margin` is the blank border in layout units.
+    """
+    suffix = os.path.splitext(os.fspath(path))[1].lower()
+    if suffix not in WRITERS:
+        raise ValueError(f"cannot export to {suffix or path!r}; use one of {tuple(WRITERS)}")
+
+    drawing = TreeDrawing(func, layout, margin)
+    geometry = drawing.geometry
+    writer = WRITERS[suffix](path, scale)
+    try:
+        writer.begin(drawing.width, drawing.height)
+
+        writer.begin_edges()
+        for x1, y1, x2, y2 in zip(
+            geometry.edge_x1.tolist(),
+            geometry.edge_y1.tolist(),
+            geometry.edge_x2.tolist(),
+            geometry.edge_y2.tolist(),
+        ):
+            writer.edge(x1, y1, x2, y2)
+
+        writer.begin_nodes()
+        r = geometry.radius
+        for u, cx, cy in zip(geometry.ids, geometry.xs.tolist(), geometry.ys.tolist()):
+            label1, label2 = drawing.labels(u)
+            writer.node(cx, cy, r, drawing.fill(u), label1, label2, drawing.size1, drawing.size2)
+
+        writer.end()
+    finally:
+        writer.close()
+    return path
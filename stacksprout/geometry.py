@@ -0,0 +1,109 @@
+"""
+Batched geometry: node centres, arrow-shortened edge endpoints and
+world -> screen transforms, computed for many nodes at once.
+
+NumPy is optional (`pip install stacksprout[fast]`). With it every
+function here is a handful of array operations; without it the same
+functions run as plain loops over `array("d")` columns. Both return
+sequences that support len(), indexing and .tolist().
+"""
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def _as_float(values):
+    if np is not None:
+        if isinstance(values, array) and values.typecode == "d":
+            return np.frombuffer(values, dtype=np.float64)
+        return np.asarray(values, dtype=np.float64)
+    return values if isinstance(values, array) and values.typecode == "d" else array("d", values)
+
+def node_centers(tree_layout, engine):
+    """World (xs, ys) of every call, in tree_layout order."""
+    step = engine.diameter + engine.cell_offset
+    ox = engine.diameter / 2 + engine.offset_x
+    oy = engine.diameter / 2 + engine.offset_y
+    if np is not None:
+        cols = _as_float(tree_layout.cols)
+        rows = np.asarray(tree_layout.rows, dtype=np.float64)
+        return cols * step + ox, rows * step + oy
+    return (
+        array("d", [c * step + ox for c in tree_layout.cols]),
+        array("d", [r * step + oy for r in tree_layout.rows]),
+    )
+
+def shorten(x1, y1, x2, y2, r):
+    """Pull every (x2, y2) back towards (x1, y1) by r, so arrows stop at the circle."""
+    if np is not None:
+        x1, y1, x2, y2 = map(_as_float, (x1, y1, x2, y2))
+        dx = x2 - x1
+        dy = y2 - y1
+        dist = np.hypot(dx, dy)
+        dist[dist == 0] = 1.0
+        return x2 - dx / dist * r, y2 - dy / dist * r
+    out_x = array("d")
+    out_y = array("d")
+    for ax, ay, bx, by in zip(x1, y1, x2, y2):
+        dx = bx - ax
+        dy = by - ay
+        dist = math.hypot(dx, dy) or 1.0
+        out_x.append(bx - dx / dist * r)
+        out_y.append(by - dy / dist * r)
+    return out_x, out_y
+
+def take(values, idx):
+    """values[idx] for a list of indices."""
+    if np is not None:
+        return _as_float(values)[np.asarray(idx, dtype=np.intp)]
+    return array("d", [values[i] for i in idx])
+
+def to_screen(xs, ys, view):
+    """World -> screen coordinates for the current VIEW (scale, tx, ty)."""
+    scale, tx, ty = view["scale"], view["tx"], view["ty"]
+    if np is not None:
+        return _as_float(xs) * scale + tx, _as_float(ys) * scale + ty
+    return (
+        array("d", [x * scale + tx for x in xs]),
+        array("d", [y * scale + ty for y in ys]),
+    )
+
+def cell_keys(xs, ys, cell_size):
+    """(col, row) grid cell of every point."""
+    if np is not None:
+        cols = np.floor_divide(_as_float(xs), cell_size).astype(np.int64)
+        rows = np.floor_divide(_as_float(ys), cell_size).astype(np.int64)
+        return list(zip(cols.tolist(), rows.tolist()))
+    return [(int(x // cell_size), int(y // cell_size)) for x, y in zip(xs, ys)]
+
+class Geometry:
+    """
+    World geometry of a laid-out trace, computed once: node centres in
+    tree_layout order and, for every call with a parent, the edge from the
+    parent centre to the child circle.
+    """
+
+    def __init__(self, tree_layout, parent, engine):
+        self.ids = tree_layout.ids
+        self.radius = engine.diameter / 2
+        self.xs, self.ys = node_centers(tree_layout, engine)
+
+        index = tree_layout.index
+        children = array("q")
+        parents = array("q")
+        for i, u in enumerate(self.ids):
+            p = parent[u]
+            if p is not None and p in index:
+                children.append(i)
+                parents.append(index[p])
+        self.edge_child = children
+        self.edge_parent = parents
+
+        self.edge_x1 = take(self.xs, parents)
+        self.edge_y1 = take(self.ys, parents)
+        self.edge_x2, self.edge_y2 = shorten(
+            self.edge_x1, self.edge_y1, take(self.xs, children), take(self.ys, children), self.radius
+        )
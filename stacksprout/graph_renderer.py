@@ -1,16 +1,56 @@
-import tkinter as tk
 import math
 from .canvas_utils import create_circle, trim_text_to_width
-from .interactions import (
+from .dedupe import call_label, result_label
+from .scene import (
     EDGE_ENDPOINTS,
+    EDGE_ITEMS,
     NODE_CENTER,
     NODE_RADIUS,
     NODE_ITEMS,
 )
 
+# node fills used when several functions share one trace
+FUNCTION_FILLS = [
+    "#cfe3ff",
+    "#ffd9b3",
+    "#d4f0c0",
+    "#f3c9e6",
+    "#fff2b3",
+    "#d9d2f5",
+    "#c8ece9",
+    "#f7c6c6",
+]
+
+def assign_function_fills(context, names):
+    """
+    Give every function name a "fn_<i>" tag and, when there is more than
+    one function, a fill colour (context.style["function_fills"]).
+    Returns the name -> tag dict.
+    """
+    function_tags = {}
+    for name in names:
+        if name not in function_tags:
+            function_tags[name] = f"fn_{len(function_tags)}"
+
+    context.style["function_fills"] = {}
+    if len(function_tags) > 1:
+        for i, (name, fn_tag) in enumerate(function_tags.items()):
+            fill = FUNCTION_FILLS[i % len(FUNCTION_FILLS)]
+            context.style["function_fills"][name] = fill
+            # shown again once the node stops being "future"
+            context.ui["graph_config"][f"{fn_tag}&&!future_node_oval"] = {"fill": fill}
+    return function_tags
+
 def draw_nodes(context):
-    for u, (row, col) in context.pos.items():
-        cx, cy = context.layout.node_center(row, col)
+    function_tags = assign_function_fills(
+        context, (context.call_info[u]["name"] for u in context.pos)
+    )
+
+    geometry = context.geometry
+    for u, cx, cy in zip(geometry.ids, geometry.xs.tolist(), geometry.ys.tolist()):
+
+        name = context.call_info[u]["name"]
+        fn_tag = function_tags[name]
 
         circle = create_circle(
             context.canvas,
@@ -20,72 +60,69 @@ def draw_nodes(context):
             fill=context.style["bg_color"],
             width=2,
             outline=context.ui["graph_config"]["future_node_oval"]["outline"],
-            tags=("node", "future_node_oval", f"node_{u}"),
+            tags=("node", "oval", "future_node_oval", f"node_{u}", fn_tag),
         )
 
         NODE_CENTER[u] = (cx, cy)
         NODE_RADIUS[u] = context.layout.diameter / 2
         NODE_ITEMS[u] = [circle]
 
-        if not context.mode["large_graph"]:
-            label1 = f"{context.call_info[u]['name']}({context.call_info[u]['args'][0]})"
-            label1 = trim_text_to_width(label1, context.style["canvas_font_medium"], context.layout.diameter)
-            label1_id = context.canvas.create_text(
-                cx,
-                cy,
-                text=label1,
-                font=context.style["canvas_font_medium"],
-                fill=context.ui["graph_config"]["future_node_label1"]["fill"],
-                justify="center",
-                anchor="center",
-                tags=("node", "future_node_label1", f"node_{u}"),
-            )
-
-            label2 = f"{context.call_info[u]['result']}"
-            label2 = trim_text_to_width(
-                label2, context.style["canvas_font_small"], math.floor(context.layout.diameter * math.sqrt(3) / 2)
-            )
-            label2_id = context.canvas.create_text(
-                cx,
-                cy + (context.layout.diameter / 4) * 1.0,  # scale is local for rendering here
-                text=label2,
-                font=context.style["canvas_font_small"],
-                fill=context.ui["graph_config"]["future_node_label2"]["fill"],
-                justify="center",
-                anchor="center",
-                tags=("node", "future_node_label2", f"node_{u}"),
-            )
-            NODE_ITEMS[u].extend([label1_id, label2_id])
-
-def draw_edges(context):
-    for u, vs in context.adj.items():
-        for v in vs:
-            if context.parent[u] == v:
-                continue
-            r = context.layout.diameter / 2
-
-            row1, col1 = context.id_to_index[u]
-            row2, col2 = context.id_to_index[v]
-
-            x1, y1, x2, y2 = context.layout.edge_endpoints(row1, col1, row2, col2)
+        label1 = call_label(context.call_info[u])
+        label1 = trim_text_to_width(label1, context.style["canvas_font_medium"], context.layout.diameter)
+        label1_id = context.canvas.create_text(
+            cx,
+            cy,
+            text=label1,
+            font=context.style["canvas_font_medium"],
+            fill=context.ui["graph_config"]["future_node_label1"]["fill"],
+            justify="center",
+            anchor="center",
+            tags=("node", "label1", "future_node_label1", f"node_{u}"),
+        )
 
-            dx = x2 - x1
-            dy = y2 - y1
-            dist = math.hypot(dx, dy) or 1.0
+        label2 = result_label(context.call_info[u], context.multiplicity.get(u, 1))
+        label2 = trim_text_to_width(
+            label2, context.style["canvas_font_small"], math.floor(context.layout.diameter * math.sqrt(3) / 2)
+        )
+        label2_id = context.canvas.create_text(
+            cx,
+            cy + (context.layout.diameter / 4) * 1.0,  # scale is local for rendering here
+            text=label2,
+            font=context.style["canvas_font_small"],
+            fill=context.ui["graph_config"]["future_node_label2"]["fill"],
+            justify="center",
+            anchor="center",
+            tags=("node", "label2", "future_node_label2", f"node_{u}"),
+        )
+        NODE_ITEMS[u].extend([label1_id, label2_id])
 
-            x2 -= dx / dist * r
-            y2 -= dy / dist * r
+    # colour nodes by function only when there is more than one
+    for name, fill in context.style["function_fills"].items():
+        context.canvas.itemconfigure(function_tags[name], fill=fill)
 
-            edge = context.canvas.create_line(
-                x1,
-                y1,
-                x2,
-                y2,
-                fill="black",
-                width=2,
-                arrow=tk.LAST,
-                arrowshape=(10, 12, 5),
-                tags=(f"edge_{v}", "edge"),
-            )
+def draw_edges(context):
+    geometry = context.geometry
+    ids = geometry.ids
+    for p, c, x1, y1, x2, y2 in zip(
+        geometry.edge_parent,
+        geometry.edge_child,
+        geometry.edge_x1.tolist(),
+        geometry.edge_y1.tolist(),
+        geometry.edge_x2.tolist(),
+        geometry.edge_y2.tolist(),
+    ):
+        u, v = ids[p], ids[c]
+        edge = context.canvas.create_line(
+            x1,
+            y1,
+            x2,
+            y2,
+            fill="black",
+            width=2,
+            arrow="last",
+            arrowshape=(10, 12, 5),
+            tags=(f"edge_{v}", "edge"),
+        )
 
-            EDGE_ENDPOINTS[edge] = (u, v)
\ No newline at end of file
+        EDGE_ENDPOINTS[edge] = (u, v)
+        EDGE_ITEMS[v] = edge
\ No newline at end of file
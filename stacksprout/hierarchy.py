@@ -0,0 +1,80 @@
+"""
+Lazily populated call hierarchy for the ttk.Treeview panel.
+
+Only the root calls are inserted up front. A call's children are inserted
+the first time its row is expanded, or when `reveal` has to show a call
+buried deeper in the tree, so opening the window costs the same no matter
+how many calls the trace has.
+"""
+
+STUB = "stub_"
+
+def item_id(node_id):
+    return f"item_{node_id}"
+
+def node_of(iid):
+    """Call id of a Treeview row, or None for a placeholder row."""
+    if not iid.startswith("item_"):
+        return None
+    return int(iid[5:])
+
+class LazyHierarchy:
+    def __init__(self, tree, parent, call_info):
+        self.tree = tree
+        self.parent = parent
+        self.call_info = call_info
+
+        # built once: call id -> child ids in call order
+        self.children = {}
+        roots = []
+        for u, p in parent.items():
+            if p is None:
+                roots.append(u)
+            else:
+                self.children.setdefault(p, []).append(u)
+        for kids in self.children.values():
+            kids.sort()
+
+        self.filled = set()  # calls whose children are in the Treeview
+        self._insert_rows("", sorted(roots))
+
+        tree.bind("<<TreeviewOpen>>", self.on_open, add="+")
+
+    def _label(self, u):
+        info = self.call_info[u]
+        return f"{u} - {info['name']}({info['args']})"
+
+    def _insert_rows(self, parent_iid, nodes):
+        tree = self.tree
+        for u in nodes:
+            iid = item_id(u)
+            tree.insert(parent_iid, "end", iid=iid, values=(u,), text=self._label(u))
+            if u in self.children:
+                # placeholder so the row gets an expand arrow
+                tree.insert(iid, "end", iid=f"{STUB}{u}", text="…")
+
+    def fill(self, u):
+        """Insert the children of call u, once."""
+        if u in self.filled:
+            return
+        self.filled.add(u)
+        kids = self.children.get(u)
+        if kids:
+            self.tree.delete(f"{STUB}{u}")
+            self._insert_rows(item_id(u), kids)
+
+    def on_open(self, _event):
+        u = node_of(self.tree.focus())
+        if u is not None:
+            self.fill(u)
+
+    def reveal(self, node_id):
+        """Insert the rows on the path down to node_id; return its iid."""
+        path = []
+        u = self.parent[node_id]
+        while u is not None and u not in self.filled:
+            path.append(u)
+            u = self.parent[u]
+        for u in reversed(path):
+            self.fill(u)
+        return item_id(node_id)
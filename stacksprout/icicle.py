@@ -0,0 +1,83 @@
+"""
+Icicle graph of a timed trace (a flame graph growing downwards).
+
+Every call is a bar below its caller, as wide as its total time; the part
+of a bar not covered by its children is the call's self time. Bars are
+coloured by self time, from pale (little) to hot (the most of any bar).
+Bars narrower than a pixel are not drawn, and neither is anything below
+them, so the number of canvas items is bounded by the canvas size.
+"""
+from .dedupe import call_label
+from .interactions import select_node
+from .timing import format_ns
+
+COOL = (0xfd, 0xe6, 0xa8)
+HOT = (0xe4, 0x57, 0x2e)
+
+def heat_color(fraction):
+    r, g, b = (round(c + (h - c) * fraction) for c, h in zip(COOL, HOT))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def icicle_bars(profile, width, min_px=1.0):
+    """(call id, depth, x, w) of every bar at least `min_px` wide on a `width` px canvas."""
+    total = profile.total
+    roots = [u for u in profile.roots if u in total]
+    grand = sum(total[u] for u in roots)
+    if not grand:
+        return []
+    scale = width / grand
+
+    bars = []
+    stack = []
+    x = 0.0
+    for u in roots:
+        stack.append((u, 0, x))
+        x += total[u] * scale
+    while stack:
+        u, depth, x = stack.pop()
+        w = total[u] * scale
+        if w < min_px:
+            continue
+        bars.append((u, depth, x, w))
+        for c in profile.children.get(u, ()):
+            if c in total:
+                stack.append((c, depth + 1, x))
+                x += total[c] * scale
+    return bars
+
+def draw_icicle(canvas, context, width, height, max_row=16):
+    """Draw context.profile on `canvas`; clicking a bar selects that call."""
+    profile = context.profile
+    bars = icicle_bars(profile, width)
+    if not bars:
+        return
+    rows = max(depth for _, depth, _, _ in bars) + 1
+    row = max(3, min(max_row, height // rows))
+    hottest = max(profile.self_time[u] for u, _, _, _ in bars) or 1
+
+    for u, depth, x, w in bars:
+        y = depth * row
+        canvas.create_rectangle(
+            x, y, x + w, y + row,
+            fill=heat_color(profile.self_time[u] / hottest),
+            outline="#ffffff",
+            tags=("icicle", f"call_{u}"),
+        )
+        if w >= 60 and row >= 12:
+            info = context.call_info[u]
+            label = call_label(info)
+            canvas.create_text(
+                x + 3, y + row / 2,
+                text=f"{label} {format_ns(profile.total[u])}"[: int(w // 7)],
+                anchor="w",
+                font=context.style["ui_font_medium"],
+                tags=("icicle", f"call_{u}"),
+            )
+
+    def on_click(_event):
+        tags = canvas.gettags("current")
+        call_tag = next((t for t in tags if t.startswith("call_")), None)
+        if call_tag is not None:
+            select_node(context.canvas, context, int(call_tag[5:]), toggle=False)
+
+    canvas.tag_bind("icicle", "<Button-1>", on_click)
@@ -1,88 +1,94 @@
 import tkinter as tk
-from .canvas_utils import get_node_circle
+from .canvas_utils import get_node_circle, world_viewport
 from .animation import animate
-
-# store graph geometry
-VIEW = {
-    "scale": 1.0,
-    "tx": 0.0,
-    "ty": 0.0,
-}
-EDGE_ENDPOINTS = {}
-NODE_CENTER = {}  # node_id -> (cx, cy)
-NODE_RADIUS = {}  # node_id -> r
-NODE_ITEMS = {}  # node_id -> list of canvas item IDs
+from .spatial_index import SpatialGrid
+from .hierarchy import node_of
+from .timing import format_ns
+from .metrics import canvas_item_counts
+from .scene import (
+    VIEW,
+    EDGE_ENDPOINTS,
+    NODE_ITEMS,
+    CULL,
+    NODE_EDGES,
+    EDGE_VISIBLE_ENDS,
+)
 
 def keybind_gate(event, view_mode, func):
     """Only run func if we're in animation view (same behaviour as before)."""
     if view_mode == 1:
         func()
 
+def build_cull_index(layout, geometry):
+    """
+    Index the drawn graph for culling: a uniform grid over the node centres
+    and, for every edge, how many of its endpoints are on screen. Call once
+    after draw_nodes / draw_edges.
+    """
+    cell_size = 4 * (layout.diameter + layout.cell_offset)
+    CULL["grid"] = SpatialGrid(geometry.ids, geometry.xs, geometry.ys, cell_size, pad=geometry.radius)
+
+    NODE_EDGES.clear()
+    EDGE_VISIBLE_ENDS.clear()
+    for edge_id, (u, v) in EDGE_ENDPOINTS.items():
+        NODE_EDGES.setdefault(u, []).append(edge_id)
+        NODE_EDGES.setdefault(v, []).append(edge_id)
+        EDGE_VISIBLE_ENDS[edge_id] = 2
+
 def cull_nodes(canvas, margin=300):
     """
     Hide node items that are outside the viewport + margin.
-    Uses NODE_CENTER / NODE_RADIUS in canvas coordinates.
+    Only the grid cells that entered or left the viewport are visited and
+    only their items are reconfigured. Returns (shown, hidden) node ids.
     """
-    vx0 = canvas.canvasx(0)
-    vy0 = canvas.canvasy(0)
-    vx1 = vx0 + canvas.winfo_width()
-    vy1 = vy0 + canvas.winfo_height()
-
-    for u, (wx, wy) in NODE_CENTER.items():
-        cx = wx * VIEW["scale"] + VIEW["tx"]
-        cy = wy * VIEW["scale"] + VIEW["ty"]
-        r  = NODE_RADIUS[u] * VIEW["scale"]
-
-        offscreen = (
-            cx + r < vx0 - margin
-            or cx - r > vx1 + margin
-            or cy + r < vy0 - margin
-            or cy - r > vy1 + margin
-        )
-
-        for item in NODE_ITEMS[u]:
-            canvas.itemconfigure(item, state="hidden" if offscreen else "normal")
-def cull_edges(canvas, margin=300):
+    grid = CULL["grid"]
+    if grid is None:
+        return [], []
+
+    entered, left = grid.update(*world_viewport(canvas, margin))
+
+    shown = [u for key in entered for u in grid.cells[key]]
+    hidden = [u for key in left for u in grid.cells[key]]
+    for nodes, state in ((shown, "normal"), (hidden, "hidden")):
+        for u in nodes:
+            for item in NODE_ITEMS[u]:
+                canvas.itemconfigure(item, state=state)
+    return shown, hidden
+def cull_edges(canvas, shown, hidden):
     """
     Hide edges where both endpoints are offscreen.
-    Uses NODE_CENTER / NODE_RADIUS in canvas coordinates.
+    `shown` / `hidden` are the nodes whose visibility just flipped; only
+    their edges are looked at.
     """
-    vx0 = canvas.canvasx(0) - margin
-    vy0 = canvas.canvasy(0) - margin
-    vx1 = vx0 + canvas.winfo_width() + margin
-    vy1 = vy0 + canvas.winfo_height() + margin
-
-    for edge_id, (u, v) in EDGE_ENDPOINTS.items():
-        wx0, wy0 = NODE_CENTER[u]
-        wx1, wy1 = NODE_CENTER[v]
-
-        cx0 = wx0 * VIEW["scale"] + VIEW["tx"]
-        cy0 = wy0 * VIEW["scale"] + VIEW["ty"]
-        cx1 = wx1 * VIEW["scale"] + VIEW["tx"]
-        cy1 = wy1 * VIEW["scale"] + VIEW["ty"]
-
-        r0 = NODE_RADIUS[u] * VIEW["scale"]
-        r1 = NODE_RADIUS[v] * VIEW["scale"]
-
-        u_off = (
-            cx0 + r0 < vx0
-            or cx0 - r0 > vx1
-            or cy0 + r0 < vy0
-            or cy0 - r0 > vy1
-        )
-
-        v_off = (
-            cx1 + r1 < vx0
-            or cx1 - r1 > vx1
-            or cy1 + r1 < vy0
-            or cy1 - r1 > vy1
-        )
-
-        canvas.itemconfigure(edge_id, state="hidden" if (u_off and v_off) else "normal")
+    ends = EDGE_VISIBLE_ENDS
+    for u in hidden:
+        for edge_id in NODE_EDGES.get(u, ()):
+            ends[edge_id] -= 1
+            if ends[edge_id] == 0:
+                canvas.itemconfigure(edge_id, state="hidden")
+    for u in shown:
+        for edge_id in NODE_EDGES.get(u, ()):
+            ends[edge_id] += 1
+            if ends[edge_id] == 1:
+                canvas.itemconfigure(edge_id, state="normal")
 def cull_canvas(canvas, margin=300):
     """Run both node and edge culling."""
-    cull_nodes(canvas, margin=margin)
-    cull_edges(canvas, margin=margin)
+    shown, hidden = cull_nodes(canvas, margin=margin)
+    cull_edges(canvas, shown, hidden)
+def refresh_view(context):
+    """After a pan or zoom: redraw the level-of-detail view, or cull the full drawing."""
+    metrics = context.metrics
+    if metrics is not None:
+        start = metrics.clock()
+
+    if context.lod is not None:
+        context.lod.render()
+    else:
+        cull_canvas(context.canvas)
+
+    if metrics is not None:
+        metrics.record_frame("lod_render" if context.lod is not None else "cull", metrics.clock() - start)
+        metrics.record_items("last", canvas_item_counts(context))
 
 def select_node(canvas, context, node_id, toggle=True):
     selected_id = context.selected_node["id"]
@@ -116,7 +122,7 @@ def select_node(canvas, context, node_id, toggle=True):
         canvas.itemconfig(circle, width=4)
     
     # Select newly selected node in TreeView
-    iid = f"item_{node_id}"
+    iid = context.ui["hierarchy_rows"].reveal(node_id)
     context.ui["hierarchy_treeview"].selection_set(iid)
     context.ui["hierarchy_treeview"].see(iid)
 
@@ -131,6 +137,11 @@ def select_node(canvas, context, node_id, toggle=True):
     info_text.insert(tk.END, f"Function: {info['name']}\n")
     info_text.insert(tk.END, f"Arguments: {info['args']}\n")
     info_text.insert(tk.END, f"Result: {info['result']}\n")
+    if context.multiplicity.get(node_id, 1) > 1:
+        info_text.insert(tk.END, f"Occurrences: {context.multiplicity[node_id]}\n")
+    if context.profile is not None and node_id in context.profile.total:
+        info_text.insert(tk.END, f"Total time: {format_ns(context.profile.total[node_id])}\n")
+        info_text.insert(tk.END, f"Self time: {format_ns(context.profile.self_time[node_id])}\n")
     info_text.insert(tk.END, f"Depth: {info['depth']}\n")
     info_text.insert(tk.END, f"In Time: {info['in_time']}\n")
     info_text.insert(tk.END, f"Out Time: {info['out_time']}\n")
@@ -142,10 +153,9 @@ def on_tree_select(event, tree, context):
     if not selection:
         return
 
-    iid = selection[0]
-    node_id = int(iid.split("_")[1])
+    node_id = node_of(selection[0])
 
-    if context.selected_node["id"] == node_id:
+    if node_id is None or context.selected_node["id"] == node_id:
         return
 
     select_node(context.canvas, context, node_id, toggle=False)
@@ -162,10 +172,11 @@ def on_node_click(event, context):
     node_id = int(node_tag[5:])
 
     select_node(canvas, context, node_id)
-def enable_canvas_pan(canvas, on_pan_end=None):
+def enable_canvas_pan(canvas, on_pan_end=None, metrics=None):
     """
     Simple middle-button pan: moves all canvas items and schedules an optional
-    on_pan_end callback after motion stops (debounced).
+    on_pan_end callback after motion stops (debounced). Each drag step is
+    timed as a "pan" frame when `metrics` is given.
     """
     pan = {"x": 0, "y": 0}
     pan_job = {"id": None}
@@ -175,6 +186,8 @@ def enable_canvas_pan(canvas, on_pan_end=None):
         pan["y"] = event.y
 
     def drag(event):
+        if metrics is not None:
+            start = metrics.clock()
         dx = event.x - pan["x"]
         dy = event.y - pan["y"]
         canvas.move("all", dx, dy)
@@ -188,6 +201,9 @@ def enable_canvas_pan(canvas, on_pan_end=None):
                 canvas.after_cancel(pan_job["id"])
             pan_job["id"] = canvas.after(80, on_pan_end)
 
+        if metrics is not None:
+            metrics.record_frame("pan", metrics.clock() - start)
+
     canvas.bind("<ButtonPress-2>", start)
     canvas.bind("<B2-Motion>", drag)
 def on_zoom(
@@ -209,6 +225,10 @@ def on_zoom(
     if not (zoom_config["min_scale"] <= new_scale <= zoom_config["max_scale"]):
         return
 
+    metrics = context.metrics
+    if metrics is not None:
+        start = metrics.clock()
+
     x = context.canvas.canvasx(event.x)
     y = context.canvas.canvasy(event.y)
     context.canvas.scale("all", x, y, factor, factor)
@@ -225,6 +245,9 @@ def on_zoom(
             context.canvas.after_cancel(context.canvas._zoom_job)
         context.canvas._zoom_job = context.canvas.after(80, on_zoom_end)
 
+    if metrics is not None:
+        metrics.record_frame("zoom", metrics.clock() - start)
+
 def bind_keys(root, context, zoom_config):
     # -- Bind zoom/pan. Pass local fonts/base sizes to on_zoom where needed --
     context.canvas.bind(
@@ -233,7 +256,7 @@ def bind_keys(root, context, zoom_config):
             e,
             context,
             zoom_config,
-            on_zoom_end=lambda: cull_canvas(context.canvas),
+            on_zoom_end=lambda: refresh_view(context),
         ),
     )
     context.canvas.bind(
@@ -242,7 +265,7 @@ def bind_keys(root, context, zoom_config):
             e,
             context,
             zoom_config,
-            on_zoom_end=lambda: cull_canvas(context.canvas),
+            on_zoom_end=lambda: refresh_view(context),
         ),
     )
     context.canvas.bind(
@@ -251,12 +274,12 @@ def bind_keys(root, context, zoom_config):
             e,
             context,
             zoom_config,
-            on_zoom_end=lambda: cull_canvas(context.canvas),
+            on_zoom_end=lambda: refresh_view(context),
         ),
     )
 
     # Panning
-    enable_canvas_pan(context.canvas, on_pan_end=lambda: cull_canvas(context.canvas))
+    enable_canvas_pan(context.canvas, on_pan_end=lambda: refresh_view(context), metrics=context.metrics)
 
     # Node click handler receives context (so it can show info, highlight, etc.)
     context.canvas.tag_bind("node", "<Button-1>", lambda event: on_node_click(event, context))
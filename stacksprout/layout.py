@@ -1,6 +1,36 @@
+from collections.abc import Mapping
+
+class TreeLayout(Mapping):
+    """
+    Result of a layout: call id -> (row, col) in grid units, stored as flat
+    arrays in layout order. Row is the call depth, col may be fractional.
+    `grid` is the SparseGrid of call ids (only occupied cells) for layouts
+    that build one, else None.
+    """
+
+    def __init__(self, ids, rows, cols, grid=None):
+        self.ids = ids
+        self.rows = rows
+        self.cols = cols
+        self.grid = grid
+        self.index = {u: i for i, u in enumerate(ids)}
+
+        self.n_rows = max(rows, default=0) + 1
+        self.n_cols = int(max(cols, default=0)) + 1
+
+    def __getitem__(self, u):
+        i = self.index[u]
+        return self.rows[i], self.cols[i]
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
 class LayoutEngine:
-    def __init__(self, tree_grid, diameter, cell_offset):
-        self.tree_grid = tree_grid
+    def __init__(self, tree_layout, diameter, cell_offset):
+        self.tree_layout = tree_layout
         self.diameter = diameter
         self.cell_offset = cell_offset
 
@@ -9,11 +39,11 @@ class LayoutEngine:
 
     def compute_centering(self, canvas_width, canvas_height):
         grid_width = (
-            (len(self.tree_grid[0]) - 1) * (self.diameter + self.cell_offset)
+            (self.tree_layout.n_cols - 1) * (self.diameter + self.cell_offset)
             + self.diameter
         )
         grid_height = (
-            (len(self.tree_grid) - 1) * (self.diameter + self.cell_offset)
+            (self.tree_layout.n_rows - 1) * (self.diameter + self.cell_offset)
             + self.diameter
         )
 
@@ -0,0 +1,385 @@
+import math
+import tkinter as tk
+from array import array
+from .animation import NODE_SUFFIXES, style_node_items
+from .canvas_utils import trim_text_to_width, world_viewport
+from .dedupe import call_label, result_label
+from .geometry import take, to_screen, shorten
+from .graph_renderer import assign_function_fills
+from .scene import (
+    VIEW,
+    EDGE_ENDPOINTS,
+    EDGE_ITEMS,
+    NODE_CENTER,
+    NODE_RADIUS,
+    NODE_ITEMS,
+)
+
+class ItemPool:
+    """
+    Canvas items of one kind, recycled from one redraw to the next.
+
+    `take()` hands out items in order, creating one only when the pool is
+    exhausted; `finish()` hides the items the last redraw did not use.
+    Items are moved with `coords` and restyled with `itemconfigure`, so a
+    redraw never deletes or creates items once the pool has grown to the
+    size of a typical view.
+    """
+
+    def __init__(self, canvas, create):
+        self.canvas = canvas
+        self.create = create  # () -> new item id
+        self.items = []
+        self.used = 0
+        self.shown = 0  # items[:shown] are not hidden
+
+    def begin(self):
+        self.used = 0
+
+    def take(self, coords, **options):
+        if self.used == len(self.items):
+            self.items.append(self.create())
+        item = self.items[self.used]
+        if self.used >= self.shown:
+            options["state"] = "normal"
+        self.used += 1
+        self.canvas.coords(item, *coords)
+        self.canvas.itemconfigure(item, **options)
+        return item
+
+    def finish(self):
+        # parked items lose their tags so tag-wide restyling skips them
+        for item in self.items[self.used:self.shown]:
+            self.canvas.itemconfigure(item, state="hidden", tags=("lod",))
+        self.shown = self.used
+
+class LodRenderer:
+    """
+    Virtualized, level-of-detail renderer for traces too large to draw
+    node by node.
+
+    Layout and subtree stats (size, depth span, world bounds) are computed
+    once into flat arrays in breadth-first order, so the children of a
+    node are a contiguous slice. Each `render()` walks down from the roots
+    in the current view: a child subtree narrower on screen than
+    `glyph_px` is not expanded, and runs of such siblings are merged into
+    one aggregate glyph showing the call count and depth span. While nodes
+    are closer than `node_px` on screen the wide subtrees are walked
+    through without drawing their nodes, so a zoomed-out trace is a row of
+    glyphs. Subtrees outside the viewport are skipped and nodes outside it
+    are walked through.
+
+    Canvas items come from per-kind ItemPools, so the number of live items
+    follows the view, not the trace size, and panning or zooming recycles
+    them instead of creating new ones.
+    """
+
+    def __init__(self, context, glyph_px=24, node_px=8, label_px=30, margin=200):
+        self.context = context
+        self.glyph_px = glyph_px
+        self.node_px = node_px  # node spacing on screen below which nodes are not drawn
+        self.label_px = label_px  # node diameter on screen below which labels are left out
+        self.margin = margin
+
+        layout = context.layout
+        self.radius = layout.diameter / 2
+        self.spacing = layout.diameter + layout.cell_offset
+
+        call_info = context.call_info
+        pos = context.pos
+        geometry = context.geometry
+
+        children = {}
+        roots = []
+        for u, p in context.parent.items():
+            if p is None:
+                roots.append(u)
+            else:
+                children.setdefault(p, []).append(u)
+
+        # breadth-first order, siblings left to right
+        col = lambda v: pos[v][1]
+        ids = sorted(roots, key=col)
+        self.root_count = len(ids)
+        self.first_child = array("q")
+        self.child_count = array("q")
+        for u in ids:
+            kids = children.pop(u, ())
+            self.first_child.append(len(ids))
+            self.child_count.append(len(kids))
+            ids.extend(sorted(kids, key=col))
+        self.ids = ids
+
+        n = len(ids)
+        order = [pos.index[u] for u in ids]  # breadth-first -> layout order
+        self.x = array("d", take(geometry.xs, order).tolist())
+        self.y = array("d", take(geometry.ys, order).tolist())
+        self.depth = array("i", [pos.rows[i] for i in order])
+
+        # fold subtree stats bottom-up (children come after their parent)
+        self.size = array("q", [1]) * n
+        self.deepest = array("i", self.depth)
+        self.x0 = array("d", self.x)
+        self.x1 = array("d", self.x)
+        self.y1 = array("d", self.y)
+        first, counts = self.first_child, self.child_count
+        size, deepest, x0, x1, y1 = self.size, self.deepest, self.x0, self.x1, self.y1
+        for i in range(n - 1, -1, -1):
+            for j in range(first[i], first[i] + counts[i]):
+                size[i] += size[j]
+                if deepest[j] > deepest[i]:
+                    deepest[i] = deepest[j]
+                if x0[j] < x0[i]:
+                    x0[i] = x0[j]
+                if x1[j] > x1[i]:
+                    x1[i] = x1[j]
+                if y1[j] > y1[i]:
+                    y1[i] = y1[j]
+
+        self.function_tags = assign_function_fills(context, (call_info[u]["name"] for u in ids))
+
+        canvas = context.canvas
+        self.ovals = ItemPool(canvas, lambda: canvas.create_oval(0, 0, 0, 0, tags=("lod",)))
+        self.labels = ItemPool(
+            canvas, lambda: canvas.create_text(0, 0, anchor="center", justify="center", tags=("lod",))
+        )
+        self.edges = ItemPool(
+            canvas,
+            lambda: canvas.create_line(0, 0, 0, 0, width=2, arrow=tk.LAST, arrowshape=(10, 12, 5), tags=("lod",)),
+        )
+        self.boxes = ItemPool(
+            canvas, lambda: canvas.create_rectangle(0, 0, 0, 0, fill="#d8d8e8", outline="#8a8aa0", tags=("lod",))
+        )
+        self.box_labels = ItemPool(
+            canvas,
+            lambda: canvas.create_text(
+                0, 0, fill="#444", justify="center", font=context.style["ui_font_medium"], tags=("lod",)
+            ),
+        )
+        self.box_edges = ItemPool(
+            canvas, lambda: canvas.create_line(0, 0, 0, 0, fill="#8a8aa0", width=1, tags=("lod",))
+        )
+        self.pools = (self.ovals, self.labels, self.edges, self.boxes, self.box_labels, self.box_edges)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- geometry ----
+    def bounds(self):
+        """World bounding box of the whole trace."""
+        r = self.radius
+        roots = range(self.root_count)
+        return (
+            min(self.x0[i] for i in roots) - r,
+            min(self.y[i] for i in roots) - r,
+            max(self.x1[i] for i in roots) + r,
+            max(self.y1[i] for i in roots) + r,
+        )
+
+    def fit_view(self, width, height):
+        """Set VIEW so the whole trace fits a width x height canvas; returns the scale."""
+        x0, y0, x1, y1 = self.bounds()
+        scale = min(1.0, width / max(x1 - x0, 1), height / max(y1 - y0, 1))
+        VIEW["scale"] = scale
+        VIEW["tx"] = width / 2 - (x0 + x1) / 2 * scale
+        VIEW["ty"] = height / 2 - (y0 + y1) / 2 * scale
+        return scale
+
+    def _to_screen(self, x, y):
+        return x * VIEW["scale"] + VIEW["tx"], y * VIEW["scale"] + VIEW["ty"]
+
+    # ---- drawing ----
+    def render(self):
+        context = self.context
+        canvas = context.canvas
+        for table in (NODE_ITEMS, NODE_CENTER, NODE_RADIUS, EDGE_ITEMS, EDGE_ENDPOINTS):
+            table.clear()
+        for pool in self.pools:
+            pool.begin()
+
+        ids = self.ids
+        if context.mode["view_mode"] == 1:
+            cursor = context.anim.cursor
+            state_of = lambda i: context.timeline.state(context.call_info[ids[i]], cursor)
+            context.anim.rendered = cursor
+        else:
+            state_of = lambda i: "active"
+
+        scale = VIEW["scale"]
+        r = self.radius
+        vx0, vy0, vx1, vy1 = world_viewport(canvas, self.margin)
+        x, y, x0, x1, y1 = self.x, self.y, self.x0, self.x1, self.y1
+        first, counts = self.first_child, self.child_count
+        # subtrees at least this wide (world units) are expanded
+        min_width = self.glyph_px / scale - self.spacing
+
+        draw_nodes = self.spacing * scale >= self.node_px
+        nodes = []  # (index, drawn parent index or -1, state)
+        glyphs = {}  # screen cell -> merged aggregate
+
+        def flush(p, run):
+            if not run:
+                return
+            if draw_nodes and len(run) == 1 and self.size[run[0]] == 1:
+                nodes.append((run[0], p, state_of(run[0])))
+            else:
+                self._add_glyph(glyphs, p, run)
+
+        # p is -1 for the roots and for nodes walked through undrawn
+        stack = [(-1, 0, self.root_count)]
+        while stack:
+            p, start, stop = stack.pop()
+            run = []
+            run_x0 = 0.0  # leftmost x0 in run, kept as the run grows
+            for v in range(start, stop):
+                if x1[v] + r < vx0 or x0[v] - r > vx1 or y1[v] + r < vy0 or y[v] - r > vy1:
+                    flush(p, run)
+                    run = []
+                elif x1[v] - x0[v] >= min_width:
+                    flush(p, run)
+                    run = []
+                    if draw_nodes and vx0 <= x[v] <= vx1 and vy0 <= y[v] <= vy1:
+                        nodes.append((v, p, state_of(v)))
+                        stack.append((v, first[v], first[v] + counts[v]))
+                    else:
+                        stack.append((-1, first[v], first[v] + counts[v]))
+                else:
+                    run_x0 = min(run_x0, x0[v]) if run else x0[v]
+                    run.append(v)
+                    if x1[v] - run_x0 >= min_width:
+                        flush(p, run)
+                        run = []
+            flush(p, run)
+
+        # screen positions of everything drawn, in one batch
+        idx = [v for v, _, _ in nodes]
+        sx, sy = to_screen(take(x, idx), take(y, idx), VIEW)
+        screen = dict(zip(idx, zip(sx.tolist(), sy.tolist())))
+
+        for v, _, state in nodes:
+            self._draw_node(v, state, *screen[v])
+        self._draw_edges([(p, v, state) for v, p, state in nodes if p >= 0], screen)
+        for glyph in glyphs.values():
+            self._draw_glyph(*glyph, screen)
+
+        for pool in self.pools:
+            pool.finish()
+        canvas.tag_lower("edge")
+        canvas.tag_lower("glyph_edge")
+
+    def _draw_node(self, i, state, cx, cy):
+        context = self.context
+        u = self.ids[i]
+        r = self.radius * VIEW["scale"]
+        info = context.call_info[u]
+
+        state_tags = tuple(f"{state}_node_{suffix}" for suffix in NODE_SUFFIXES)
+        circle = self.ovals.take(
+            (cx - r, cy - r, cx + r, cy + r),
+            width=4 if context.selected_node["id"] == u else 2,
+            tags=("lod", "node", "oval", *state_tags, f"node_{u}", self.function_tags[info["name"]]),
+        )
+        items = [circle]
+
+        if 2 * r >= self.label_px:
+            label1 = trim_text_to_width(
+                call_label(info),
+                context.style["canvas_font_medium"],
+                2 * r,
+            )
+            label2 = trim_text_to_width(
+                result_label(info, context.multiplicity.get(u, 1)),
+                context.style["canvas_font_small"],
+                math.floor(2 * r * math.sqrt(3) / 2),
+            )
+            items.append(self.labels.take(
+                (cx, cy),
+                text=label1,
+                font=context.style["canvas_font_medium"],
+                tags=("lod", "node", "label1", *state_tags, f"node_{u}"),
+            ))
+            items.append(self.labels.take(
+                (cx, cy + r / 2),
+                text=label2,
+                font=context.style["canvas_font_small"],
+                tags=("lod", "node", "label2", *state_tags, f"node_{u}"),
+            ))
+
+        style_node_items(context, u, items, state)
+        NODE_CENTER[u] = (self.x[i], self.y[i])
+        NODE_RADIUS[u] = self.radius
+        NODE_ITEMS[u] = items
+
+    def _draw_edges(self, edges, screen):
+        """Arrows for (parent index, child index, child state), shortened in one batch."""
+        x1 = [screen[p][0] for p, _, _ in edges]
+        y1 = [screen[p][1] for p, _, _ in edges]
+        x2, y2 = shorten(
+            x1,
+            y1,
+            [screen[i][0] for _, i, _ in edges],
+            [screen[i][1] for _, i, _ in edges],
+            self.radius * VIEW["scale"],
+        )
+        graph_config = self.context.ui["graph_config"]
+        for (p, i, state), ax, ay, bx, by in zip(edges, x1, y1, x2.tolist(), y2.tolist()):
+            u, v = self.ids[p], self.ids[i]
+            edge = self.edges.take(
+                (ax, ay, bx, by),
+                tags=("lod", f"edge_{v}", "edge", f"{state}_edge"),
+                **graph_config[f"{state}_edge"],
+            )
+            EDGE_ENDPOINTS[edge] = (u, v)
+            EDGE_ITEMS[v] = edge
+
+    def _add_glyph(self, glyphs, p, run):
+        """
+        Fold the subtrees in `run` (adjacent siblings) into the glyph that
+        owns their screen cell, so overlapping aggregates become one box.
+        """
+        r = self.radius
+        x0 = min(self.x0[v] for v in run) - r
+        y0 = self.y[run[0]] - r
+        x1 = max(self.x1[v] for v in run) + r
+        y1 = max(self.y1[v] for v in run) + r
+        count = sum(self.size[v] for v in run)
+        top = self.depth[run[0]]
+        bottom = max(self.deepest[v] for v in run)
+
+        sx, sy = self._to_screen((x0 + x1) / 2, y0)
+        key = (int(sx // self.glyph_px), int(sy // self.glyph_px))
+        glyph = glyphs.get(key)
+        if glyph is None:
+            glyphs[key] = [x0, y0, x1, y1, count, top, bottom, {p}]
+        else:
+            glyph[0] = min(glyph[0], x0)
+            glyph[1] = min(glyph[1], y0)
+            glyph[2] = max(glyph[2], x1)
+            glyph[3] = max(glyph[3], y1)
+            glyph[4] += count
+            glyph[5] = min(glyph[5], top)
+            glyph[6] = max(glyph[6], bottom)
+            glyph[7].add(p)
+
+    def _draw_glyph(self, x0, y0, x1, y1, count, top, bottom, parents, screen):
+        """One box standing in for `count` calls at depths top..bottom."""
+        gx0, gy0 = self._to_screen(x0, y0)
+        gx1, gy1 = self._to_screen(x1, y1)
+        self.boxes.take((gx0, gy0, gx1, gy1), tags=("lod", "glyph"))
+        if gx1 - gx0 >= self.glyph_px and gy1 - gy0 >= self.glyph_px:
+            depths = f"d{top}" if top == bottom else f"d{top}-{bottom}"
+            self.box_labels.take(
+                ((gx0 + gx1) / 2, (gy0 + gy1) / 2),
+                text=f"{count}\n{depths}",
+                tags=("lod", "glyph"),
+            )
+
+        # -1 for glyphs under the roots or under nodes walked through
+        for p in parents:
+            if p < 0:
+                continue
+            px, py = screen[p]
+            self.box_edges.take(
+                (px, py, (gx0 + gx1) / 2, gy0),
+                tags=("lod", "glyph_edge"),
+            )
@@ -0,0 +1,134 @@
+"""
+Opt-in instrumentation of the trace window.
+
+With `visualize_tree(func, metrics=...)` the window times its startup
+phases (placing the calls, geometry, timeline, drawing, the controls and
+hierarchy, until Tk is first idle), every animate step, every cull or
+level-of-detail redraw after a pan or zoom, and the zoom and pan handlers
+themselves, and counts canvas items after each redraw. Without it the
+hooks cost a `context.metrics is None` check.
+"""
+import time
+from contextlib import contextmanager
+
+from .scene import NODE_ITEMS, EDGE_VISIBLE_ENDS, CULL
+
+class ViewMetrics:
+    """
+    Timings of one trace window, in ns on `clock`.
+
+    `phases` maps each startup phase to its duration, in the order they
+    ran ("ui" includes "hierarchy" and "icicle"; "total" runs from opening
+    the window until Tk is first idle). `frames` maps each kind of
+    interaction ("animate", "cull", "lod_render", "zoom", "pan") to the
+    durations of every time it ran. `items` holds canvas item counts
+    ({"items": created, "shown": not hidden}) after startup and after the
+    last redraw.
+
+    `callback(kind, name, value)` is called as data comes in: kind is
+    "phase" or "frame" with value in ms, or "items" with the counts.
+    """
+
+    def __init__(self, callback=None, clock=time.perf_counter_ns):
+        self.callback = callback
+        self.clock = clock
+        self.phases = {}
+        self.frames = {}
+        self.items = {}
+        self.max_shown = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record_phase(name, self.clock() - start)
+
+    def record_phase(self, name, ns):
+        self.phases[name] = ns
+        if self.callback is not None:
+            self.callback("phase", name, ns / 1e6)
+
+    def record_frame(self, kind, ns):
+        self.frames.setdefault(kind, []).append(ns)
+        if self.callback is not None:
+            self.callback("frame", kind, ns / 1e6)
+
+    def record_items(self, name, counts):
+        self.items[name] = counts
+        self.max_shown = max(self.max_shown, counts["shown"])
+        if self.callback is not None:
+            self.callback("items", name, counts)
+
+    def report(self):
+        """Everything recorded so far as plain data (ms), ready for json.dumps."""
+        frames = {}
+        for kind, samples in self.frames.items():
+            ordered = sorted(samples)
+            frames[kind] = {
+                "count": len(ordered),
+                "total_ms": sum(ordered) / 1e6,
+                "median_ms": ordered[len(ordered) // 2] / 1e6,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] / 1e6,
+                "max_ms": ordered[-1] / 1e6,
+            }
+        return {
+            "startup_ms": {name: ns / 1e6 for name, ns in self.phases.items()},
+            "frames": frames,
+            "canvas_items": dict(self.items, max_shown=self.max_shown),
+        }
+
+    def over_budget(self, budgets):
+        """
+        Check the report against `budgets` ({name: ms}): a startup phase
+        by name, or a frame kind by its p95. Returns (name, measured ms,
+        budget ms) for every budget exceeded; unmeasured names are skipped.
+        """
+        report = self.report()
+        exceeded = []
+        for name, budget in budgets.items():
+            if name in report["startup_ms"]:
+                measured = report["startup_ms"][name]
+            elif name in report["frames"]:
+                measured = report["frames"][name]["p95_ms"]
+            else:
+                continue
+            if measured > budget:
+                exceeded.append((name, measured, budget))
+        return exceeded
+
+def as_metrics(metrics):
+    """visualize_tree's `metrics=` argument: None/False, True, a ViewMetrics or a callback."""
+    if metrics is None or metrics is False:
+        return None
+    if metrics is True:
+        return ViewMetrics()
+    if isinstance(metrics, ViewMetrics):
+        return metrics
+    if callable(metrics):
+        return ViewMetrics(callback=metrics)
+    raise TypeError(f"metrics must be a bool, a ViewMetrics or a callback, got {metrics!r}")
+
+@contextmanager
+def phase(context, name):
+    """Time a startup phase of the window when it is instrumented."""
+    if context.metrics is None:
+        yield
+    else:
+        with context.metrics.phase(name):
+            yield
+
+def canvas_item_counts(context):
+    """Canvas items created and not hidden, from the scene tables rather than the canvas."""
+    if context.lod is not None:
+        pools = context.lod.pools
+        return {"items": sum(len(p.items) for p in pools), "shown": sum(p.shown for p in pools)}
+
+    items = sum(len(v) for v in NODE_ITEMS.values()) + len(EDGE_VISIBLE_ENDS)
+    grid = CULL["grid"]
+    if grid is None:
+        return {"items": items, "shown": items}
+    shown = sum(len(NODE_ITEMS[u]) for key in grid.visible for u in grid.cells.get(key, ()))
+    shown += sum(1 for ends in EDGE_VISIBLE_ENDS.values() if ends > 0)
+    return {"items": items, "shown": shown}
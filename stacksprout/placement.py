@@ -0,0 +1,16 @@
+from .tree_to_grid import grid_layout
+from .tidy_layout import tidy_layout
+
+# layout name -> function (parent, call_info) -> TreeLayout
+LAYOUTS = {
+    "grid": grid_layout,
+    "tidy": tidy_layout,
+}
+
+def place_calls(parent, call_info, layout="grid"):
+    """Run a layout given by name or as a function; returns a TreeLayout."""
+    if callable(layout):
+        return layout(parent, call_info)
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {tuple(LAYOUTS)} or a callable, got {layout!r}")
+    return LAYOUTS[layout](parent, call_info)
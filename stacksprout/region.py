@@ -0,0 +1,184 @@
+"""
+Recording a region of code without decorating anything:
+
+    with stacksprout.capture(filter="networkx.*") as t:
+        networkx.shortest_path(G, a, b)
+    visualize_tree(t)
+
+A call hook (sys.settrace, so the calling thread only) sees every Python
+call made inside the block; C functions and builtins never reach it.
+Whether a function is recorded is decided once per code object and
+cached, so for everything else the hook costs a dict lookup and turns
+itself off for that frame. Recorded frames get a local hook with line
+events switched off, which only acts on their return. Functions that are
+not recorded are transparent: a recorded call hangs under its nearest
+recorded caller.
+"""
+import sys
+from fnmatch import fnmatchcase
+from operator import itemgetter
+
+from .tracer import TraceSession
+
+# code object flags, the values of inspect.CO_*; importing inspect would
+# cost more than the rest of the tracer
+_CO_NEWLOCALS = 0x2
+_CO_VARARGS = 0x4
+_CO_GENERATOR = 0x20
+_CO_COROUTINE = 0x80
+_CO_ASYNC_GENERATOR = 0x200
+
+# generators and coroutines enter and leave their frame at every resume
+_RESUMABLE = _CO_GENERATOR | _CO_COROUTINE | _CO_ASYNC_GENERATOR
+
+def code_filter(filter):
+    """
+    `filter=` of capture as a (module, qualname) -> bool function.
+
+    None records every Python function. A string, or a list of them, is a
+    glob matched against "module.qualname" ("pkg.*", "*.visit_*"); a
+    string without wildcards matches that name and everything under it,
+    so "pkg", "pkg.mod" and "pkg.mod.Class" all work. A callable is used
+    as is.
+    """
+    if filter is None:
+        return lambda module, qualname: True
+    if callable(filter):
+        return filter
+    patterns = (filter,) if isinstance(filter, str) else tuple(filter)
+    if not patterns or not all(isinstance(p, str) for p in patterns):
+        raise TypeError(f"filter must be None, a pattern, a list of patterns or a callable, got {filter!r}")
+
+    globs = [p for p in patterns if any(c in p for c in "*?[")]
+    names = tuple(p for p in patterns if p not in globs)
+    prefixes = tuple(n + "." for n in names)
+
+    def matches(module, qualname):
+        name = f"{module}.{qualname}"
+        if name in names or name.startswith(prefixes):
+            return True
+        return any(fnmatchcase(name, p) for p in globs)
+
+    return matches
+
+def arg_reader(code):
+    """frame -> the positional arguments the frame was called with, extra *args included."""
+    names = code.co_varnames[: code.co_argcount]
+    star = code.co_varnames[code.co_argcount + code.co_kwonlyargcount] if code.co_flags & _CO_VARARGS else None
+
+    if star is None and len(names) == 1:
+        # the common case gets a reader without the loop
+        get = itemgetter(names[0])
+
+        def read(frame):
+            return (get(frame.f_locals),)
+    else:
+        def read(frame):
+            values = frame.f_locals
+            args = tuple([values[n] for n in names])
+            if star is not None:
+                args += values[star]
+            return args
+
+    return read
+
+class RegionCapture:
+    """Context manager returned by `capture`; entering it yields the TraceSession recorded into."""
+
+    def __init__(self, matches, max_depth, session):
+        self.session = session
+        self._previous = None
+        self._calls = calls = []  # ids of the recorded calls still running
+
+        store = session.store
+        begin = store.begin
+        end = store.end
+        keep = session.capture
+        deepest = max_depth if max_depth is not None else float("inf")
+        limit = session.max_calls if session.max_calls is not None else float("inf")
+        decisions = {}  # code -> (name, argument reader), or None when not recorded
+
+        def decide(frame):
+            code = frame.f_code
+            module = frame.f_globals.get("__name__") or ""
+            qualname = getattr(code, "co_qualname", code.co_name)
+            if module == __name__ or module.startswith("stacksprout."):
+                return None
+            # module and class bodies, comprehensions, generators
+            if not code.co_flags & _CO_NEWLOCALS or code.co_flags & _RESUMABLE:
+                return None
+            if code.co_name.startswith("<") and code.co_name != "<lambda>":
+                return None
+            if not matches(module, qualname):
+                return None
+            return store.intern(code.co_name), arg_reader(code)
+
+        def on_return(frame, event, arg):
+            if event == "return":
+                # arg is None when the call is left by an exception
+                end(calls.pop(), arg if keep is None else keep(arg), next(session.clock))
+            return on_return
+
+        def on_call(frame, event, arg):
+            try:
+                decision = decisions[frame.f_code]
+            except KeyError:
+                decision = decisions[frame.f_code] = decide(frame)
+            if decision is None or len(calls) >= deepest or len(store) >= limit:
+                return None
+            name, read_args = decision
+            args = read_args(frame)
+            calls.append(begin(
+                calls[-1] if calls else None,
+                name,
+                args if keep is None else tuple(map(keep, args)),
+                next(session.clock),
+                len(calls) + 1,
+            ))
+            frame.f_trace_lines = False
+            return on_return
+
+        self._hook = on_call
+
+    def __enter__(self):
+        self.session.clear()
+        self._previous = sys.gettrace()
+        sys.settrace(self._hook)
+        return self.session
+
+    def __exit__(self, *exc_info):
+        sys.settrace(self._previous)
+        # calls the block left running (e.g. it raised from a nested callback)
+        session = self.session
+        while self._calls:
+            session.store.end(self._calls.pop(), None, next(session.clock))
+        return False
+
+def capture(filter=None, *, max_depth=None, max_calls=None, compact=False, capture=None):
+    """
+    Record the calls made inside a `with` block as a call tree, without
+    decorating anything:
+
+        with capture(filter="mylib") as t:
+            mylib.solve(problem)
+        visualize_tree(t)
+
+    `filter` chooses the functions recorded (see code_filter): a module or
+    package name, a "module.qualname" glob, a list of those, or a callable
+    `(module, qualname) -> bool`. Only calls made by the thread that
+    enters the block are seen, and a debugger or coverage tool using
+    sys.settrace on it is suspended meanwhile. Generators and coroutines
+    are not recorded.
+
+    `max_depth` and `max_calls` bound the recorded tree like trace's
+    options of the same names (mode "head"); `compact` and `capture` are
+    trace's too. Args are the positional parameters as bound.
+    """
+    session = TraceSession(
+        "capture",
+        compact=compact,
+        max_calls=max_calls,
+        capture=capture,
+        accumulate=True,
+    )
+    return RegionCapture(code_filter(filter), max_depth, session)
@@ -0,0 +1,23 @@
+# store graph geometry
+VIEW = {
+    "scale": 1.0,
+    "tx": 0.0,
+    "ty": 0.0,
+}
+EDGE_ENDPOINTS = {}  # edge item ID -> (parent node_id, child node_id)
+EDGE_ITEMS = {}  # child node_id -> edge item ID
+NODE_CENTER = {}  # node_id -> (cx, cy)
+NODE_RADIUS = {}  # node_id -> r
+NODE_ITEMS = {}  # node_id -> list of canvas item IDs (oval, label1, label2)
+
+# viewport culling state, built once after drawing (see interactions.build_cull_index)
+CULL = {"grid": None}  # SpatialGrid over node centres
+NODE_EDGES = {}  # node_id -> edge item IDs touching the node
+EDGE_VISIBLE_ENDS = {}  # edge item ID -> number of endpoints on screen
+
+def reset_scene():
+    """Forget everything drawn, before drawing a trace (again) in this process."""
+    VIEW.update(scale=1.0, tx=0.0, ty=0.0)
+    for table in (EDGE_ENDPOINTS, EDGE_ITEMS, NODE_CENTER, NODE_RADIUS, NODE_ITEMS, NODE_EDGES, EDGE_VISIBLE_ENDS):
+        table.clear()
+    CULL["grid"] = None
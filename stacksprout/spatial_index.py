@@ -0,0 +1,53 @@
+from .geometry import cell_keys
+
+class SpatialGrid:
+    """
+    Uniform grid over node centres in world coordinates (the coordinates
+    the nodes were drawn at, before any pan or zoom). Built once after
+    drawing.
+
+    Visibility is tracked per cell: `update` takes the visible world
+    rectangle and returns only the cells that entered or left it since the
+    previous call, so callers touch the items in those cells and nothing
+    else.
+    """
+
+    def __init__(self, ids, xs, ys, cell_size, pad=0):
+        self.cell_size = cell_size
+        self.pad = pad  # world distance added around the viewport (node radius)
+        self.cells = {}  # (col, row) -> node ids
+        for u, key in zip(ids, cell_keys(xs, ys, cell_size)):
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = [u]
+            else:
+                cell.append(u)
+
+        # everything is drawn visible, so every cell starts on screen
+        self.visible = set(self.cells)
+
+    def cells_in(self, x0, y0, x1, y1):
+        """Non-empty cells overlapping the world rectangle (x0, y0)-(x1, y1)."""
+        s = self.cell_size
+        c0, c1 = int(x0 // s), int(x1 // s)
+        r0, r1 = int(y0 // s), int(y1 // s)
+        cells = self.cells
+
+        # zoomed far out the rectangle spans more cells than exist
+        if (c1 - c0 + 1) * (r1 - r0 + 1) > len(cells):
+            return {k for k in cells if c0 <= k[0] <= c1 and r0 <= k[1] <= r1}
+        return {
+            (c, r)
+            for c in range(c0, c1 + 1)
+            for r in range(r0, r1 + 1)
+            if (c, r) in cells
+        }
+
+    def update(self, x0, y0, x1, y1):
+        """Return (entered, left): cells that became visible / hidden."""
+        pad = self.pad
+        now = self.cells_in(x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+        entered = now - self.visible
+        left = self.visible - now
+        self.visible = now
+        return entered, left
@@ -0,0 +1,152 @@
+"""
+Tidy tree layout (Walker's algorithm in the linear-time form of
+Buchheim, Juenger and Leipert).
+
+Children keep call order left to right, each parent is centred over its
+children, and subtrees are pushed apart only as far as needed, so the
+tree is as narrow as a tidy drawing allows. Everything runs on flat
+per-node lists with explicit stacks - no recursion and no grid.
+"""
+from array import array
+from .layout import TreeLayout
+
+def tidy_layout(parent, call_info=None):
+    """Lay out a trace's call tree; returns a TreeLayout (row = depth, col = x)."""
+    # dense breadth-first numbering; node 0 is a virtual root above the
+    # real roots, so several roots are laid out side by side as one forest
+    children = {}
+    roots = []
+    for u, p in parent.items():
+        if p is None:
+            roots.append(u)
+        else:
+            children.setdefault(p, []).append(u)
+
+    ids = [None]
+    up = [-1]
+    level = [0]
+    first = []
+    count = []
+    i = 0
+    while i < len(ids):
+        kids = sorted(roots) if i == 0 else sorted(children.pop(ids[i], ()))
+        first.append(len(ids))
+        count.append(len(kids))
+        ids.extend(kids)
+        up.extend([i] * len(kids))
+        level.extend([level[i] + 1] * len(kids))
+        i += 1
+
+    n = len(ids)
+    prelim = [0.0] * n
+    mod = [0.0] * n
+    shift = [0.0] * n
+    change = [0.0] * n
+    thread = [-1] * n
+    ancestor = list(range(n))
+    default_ancestor = [first[i] for i in range(n)]
+
+    def next_left(v):
+        return first[v] if count[v] else thread[v]
+
+    def next_right(v):
+        return first[v] + count[v] - 1 if count[v] else thread[v]
+
+    def apportion(v, default):
+        if v == first[up[v]]:
+            return default
+        w = v - 1  # left sibling
+        vir = vor = v
+        vil = w
+        vol = first[up[v]]  # leftmost sibling
+        sir = mod[vir]
+        sor = mod[vor]
+        sil = mod[vil]
+        sol = mod[vol]
+        while True:
+            nr = next_right(vil)
+            nl = next_left(vir)
+            if nr < 0 or nl < 0:
+                break
+            vil = nr
+            vir = nl
+            vol = next_left(vol)
+            vor = next_right(vor)
+            ancestor[vor] = v
+            move = (prelim[vil] + sil) - (prelim[vir] + sir) + 1.0
+            if move > 0:
+                a = ancestor[vil]
+                wl = a if up[a] == up[v] else default
+                subtrees = v - wl
+                change[v] -= move / subtrees
+                shift[v] += move
+                change[wl] += move / subtrees
+                prelim[v] += move
+                mod[v] += move
+                sir += move
+                sor += move
+            sil += mod[vil]
+            sir += mod[vir]
+            sol += mod[vol]
+            sor += mod[vor]
+        nr = next_right(vil)
+        if nr >= 0 and next_right(vor) < 0:
+            thread[vor] = nr
+            mod[vor] += sil - sor
+        nl = next_left(vir)
+        if nl >= 0 and next_left(vol) < 0:
+            thread[vol] = nl
+            mod[vol] += sir - sol
+            default = v
+        return default
+
+    # first walk: post-order, each child apportioned as soon as it is done
+    ptr = [0] * n
+    stack = [0]
+    while stack:
+        v = stack[-1]
+        if ptr[v] < count[v]:
+            stack.append(first[v] + ptr[v])
+            ptr[v] += 1
+            continue
+        stack.pop()
+
+        left = v - 1 if v > 0 and v != first[up[v]] else -1
+        if count[v] == 0:
+            prelim[v] = prelim[left] + 1.0 if left >= 0 else 0.0
+        else:
+            # execute shifts
+            s = c = 0.0
+            for w in range(first[v] + count[v] - 1, first[v] - 1, -1):
+                prelim[w] += s
+                mod[w] += s
+                c += change[w]
+                s += shift[w] + c
+            midpoint = (prelim[first[v]] + prelim[first[v] + count[v] - 1]) / 2
+            if left >= 0:
+                prelim[v] = prelim[left] + 1.0
+                mod[v] = prelim[v] - midpoint
+            else:
+                prelim[v] = midpoint
+
+        if v > 0:
+            p = up[v]
+            default_ancestor[p] = apportion(v, default_ancestor[p])
+
+    # second walk: parents before children, so one forward pass adds up mods
+    x = prelim
+    acc = [0.0] * n
+    for v in range(n):
+        m = acc[v] + mod[v]
+        for w in range(first[v], first[v] + count[v]):
+            acc[w] = m
+        if v:
+            x[v] = prelim[v] + acc[v]
+
+    real = range(1, n)
+    left_edge = min((x[v] for v in real), default=0.0)
+    return TreeLayout(
+        array("q", ids[1:]),
+        array("i", level[1:]),
+        array("d", [x[v] - left_edge for v in real]),
+    )
@@ -0,0 +1,87 @@
+from array import array
+from bisect import bisect_right
+
+ENTER = 0
+EXIT = 1
+
+def node_state(info, now):
+    """State of a call at event time `now` (0 = before the first event)."""
+    if info["in_time"] > now:
+        return "future"
+    if info["out_time"] is None or info["out_time"] > now:
+        return "active"
+    return "completed"
+
+class TimelineIndex:
+    """
+    Enter/exit events of a finished trace, sorted by time, built once.
+
+    A cursor p means "the first p events have happened" (0..len(index)).
+    Every `checkpoint_every` events the set of running calls is stored, so
+    `active_at(p)` replays at most one checkpoint interval of events, and
+    `changed_between(a, b)` finds the calls whose state differs between two
+    cursors without looking at any other call.
+    """
+
+    def __init__(self, call_info, checkpoint_every=1024):
+        events = []
+        for u, info in call_info.items():
+            events.append((info["in_time"], ENTER, u))
+            if info["out_time"] is not None:
+                events.append((info["out_time"], EXIT, u))
+        events.sort()
+
+        self.times = array("q", [e[0] for e in events])
+        self.kinds = array("b", [e[1] for e in events])
+        self.nodes = array("q", [e[2] for e in events])
+        del events
+
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = []  # checkpoints[k] = running calls after k * checkpoint_every events
+        active = set()
+        for i, (kind, u) in enumerate(zip(self.kinds, self.nodes)):
+            if i % checkpoint_every == 0:
+                self.checkpoints.append(tuple(active))
+            if kind == ENTER:
+                active.add(u)
+            else:
+                active.discard(u)
+        if len(self.nodes) % checkpoint_every == 0:
+            self.checkpoints.append(tuple(active))
+
+    def __len__(self):
+        return len(self.times)
+
+    def time_at(self, p):
+        """Time of the p-th event, 0 for p == 0."""
+        return self.times[p - 1] if p > 0 else 0
+
+    def cursor_at_time(self, t):
+        """Number of events that have happened by time `t`."""
+        return bisect_right(self.times, t)
+
+    def changed_between(self, a, b):
+        """Ids of the calls with an event between cursors a and b (either order)."""
+        lo, hi = (a, b) if a <= b else (b, a)
+        return set(self.nodes[lo:hi])
+
+    def state(self, info, p):
+        """"future", "active" or "completed" for a call record at cursor p."""
+        return node_state(info, self.time_at(p))
+
+    def active_at(self, p):
+        """Set of call ids running at cursor p."""
+        k = p // self.checkpoint_every
+        active = set(self.checkpoints[k])
+        kinds = self.kinds
+        nodes = self.nodes
+        for i in range(k * self.checkpoint_every, p):
+            if kinds[i] == ENTER:
+                active.add(nodes[i])
+            else:
+                active.discard(nodes[i])
+        return active
+
+    def active_at_time(self, t):
+        """Set of call ids running at time `t`."""
+        return self.active_at(self.cursor_at_time(t))
@@ -0,0 +1,138 @@
+"""
+Per-call clock readings and the self/total time post-pass.
+
+With `@trace(timing="wall")` (time.perf_counter_ns) or `timing="cpu"`
+(time.process_time_ns) the wrapper reads the clock right before and right
+after the traced function runs. Readings go into a CallTimes side table
+next to the trace store: 16 bytes per call id, kept in memory and not
+written to trace files, which is why the tracer refuses timing= together
+with sink= or the evicting ring/sample modes.
+
+The readings include the tracer's own work for every traced call below,
+so TimeProfile subtracts a calibrated overhead per call (see
+TraceSession.timing_overhead) before splitting time into self and total.
+"""
+import threading
+import time
+from array import array
+
+CLOCKS = {
+    "wall": time.perf_counter_ns,
+    "cpu": time.process_time_ns,
+}
+
+class CallTimes:
+    """Start/stop clock readings in ns, indexed by call id (0 = not recorded)."""
+
+    def __init__(self, clock_name):
+        self.clock_name = clock_name
+        self.starts = array("q")
+        self.stops = array("q")
+        self._lock = threading.Lock()
+
+    def clear(self):
+        del self.starts[:]
+        del self.stops[:]
+
+    def record(self, call_id, start, stop):
+        i = call_id - 1
+        if i >= len(self.starts):
+            # calls finish out of id order, and from several threads
+            self._grow(i + 1)
+        self.starts[i] = start
+        self.stops[i] = stop
+
+    def _grow(self, size):
+        """Make room for at least `size` calls; unwritten slots read as not recorded."""
+        with self._lock:
+            missing = size - len(self.starts)
+            if missing > 0:
+                missing = max(missing, 256, len(self.starts) // 8)
+                # record checks `starts` without the lock, so it grows last
+                self.stops.frombytes(bytes(missing * self.stops.itemsize))
+                self.starts.frombytes(bytes(missing * self.starts.itemsize))
+
+    def elapsed(self, call_id):
+        """Raw ns between the two readings of a call, None while it runs."""
+        i = call_id - 1
+        if i >= len(self.stops) or not self.stops[i]:
+            return None
+        return self.stops[i] - self.starts[i]
+
+class TimeProfile:
+    """
+    Self and total time of every call of a timed trace, in ns with the
+    tracer's overhead taken out, plus the same per argument pattern
+    (function name and args).
+
+    `total[u]` covers the call and everything it called; `self_time[u]`
+    is the part not spent in traced children. Calls still running have no
+    times.
+    """
+
+    def __init__(self, func):
+        times = getattr(func, "call_times", None)
+        if times is None:
+            raise ValueError("trace has no timings; trace it with @trace(timing='wall') or timing='cpu'")
+        parent = func.parent
+        call_info = func.call_info
+        session = getattr(func, "trace_session", func)
+        inner, per_call = session.timing_overhead()
+        self.clock_name = times.clock_name
+
+        children = {}
+        roots = []
+        for u, p in parent.items():
+            if p is None:
+                roots.append(u)
+            else:
+                children.setdefault(p, []).append(u)
+        self.roots = sorted(roots)
+        self.children = children
+        for kids in children.values():
+            kids.sort()
+
+        order = list(self.roots)
+        for u in order:
+            order.extend(children.get(u, ()))
+
+        # children before parents: descendants and child totals are ready
+        self.total = {}
+        self.self_time = {}
+        below = {}
+        for u in reversed(order):
+            raw = times.elapsed(u)
+            if raw is None:
+                continue
+            kids = [c for c in children.get(u, ()) if c in self.total]
+            descendants = sum(below[c] + 1 for c in kids)
+            below[u] = descendants
+            total = max(0, raw - inner - round(per_call * descendants))
+            self.total[u] = total
+            self.self_time[u] = max(0, total - sum(self.total[c] for c in kids))
+
+        # not imported at the top: the tracer imports this module
+        from .dedupe import arg_key
+
+        self.by_pattern = {}  # (name, args) -> [calls, total ns, self ns]
+        for u, total in self.total.items():
+            info = call_info[u]
+            entry = self.by_pattern.setdefault(arg_key(info["name"], info["args"]), [0, 0, 0])
+            entry[0] += 1
+            entry[1] += total
+            entry[2] += self.self_time[u]
+
+    def hotspots(self, n=10):
+        """The n argument patterns with the most self time: ((name, args), calls, total, self)."""
+        ranked = sorted(self.by_pattern.items(), key=lambda item: item[1][2], reverse=True)
+        return [(key, calls, total, own) for key, (calls, total, own) in ranked[:n]]
+
+def format_ns(ns):
+    """Short human-readable duration."""
+    if ns >= 1_000_000_000:
+        return f"{ns / 1e9:.2f} s"
+    if ns >= 1_000_000:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1_000:
+        return f"{ns / 1e3:.1f} µs"
+    return f"{ns} ns"
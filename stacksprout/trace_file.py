@@ -0,0 +1,450 @@
+"""
+Binary trace files.
+
+Layout (all integers little-endian):
+
+    header   64 bytes   magic, version, flags, record count, section offsets
+    records  count * 80 fixed-width records of ten int64 fields:
+             id, parent (0 = root), in_time, out_time (0 = unfinished),
+             depth, name index, args offset, args length,
+             result offset, result length
+    blob     encoded args / results, offsets are relative to this section
+    names    function names, utf-8, one per line
+
+Args are stored as a sequence of (uint32 length, utf-8 repr) pairs and a
+result as its utf-8 repr; both are decoded only when a record field is read.
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections import deque
+from itertools import count
+from operator import itemgetter
+from .capture_policy import CapturedRepr
+from .trace_store import ParentView, CallInfoView
+
+MAGIC = b"SSPTRACE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQ")
+HEADER_SIZE = 64
+RECORD_FIELDS = 10
+RECORD_SIZE = RECORD_FIELDS * 8
+LENGTH = struct.Struct("<I")
+RECORD = struct.Struct(f"<{RECORD_FIELDS}q")
+
+# flags
+FLAG_ORDERED = 1  # record i holds call id i + 1
+
+_NATIVE = sys.byteorder == "little"
+
+_call_id = itemgetter(0)
+
+class TraceWriter:
+    """
+    Writer for trace files.
+
+    `write` only queues a call; encoding the args and result and writing
+    the records happen in batches in `flush`. Records go straight after
+    the header and args/results to a temporary blob file that is copied in
+    on close, so neither side is ever held in memory as a whole.
+
+    By default records are appended in the order they are written. With
+    `by_id=True` the ids must be 1..n, written in any order, and call i
+    is written to record slot i - 1, so the file comes out ordered however
+    the calls arrive.
+
+    `write` may be called from several threads; `flush` and `close` are
+    serialized by a lock.
+    """
+
+    def __init__(self, path, batch_size=4096, by_id=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.by_id = by_id
+        self.count = 0
+        # calls written but not yet encoded; deque appends need no lock
+        self.pending = deque()
+
+        # written next to the target and renamed on close, so a reader that
+        # still maps an older file at `path` is never truncated under it
+        self._part_path = f"{path}.part"
+        self._file = open(self._part_path, "wb")
+        self._file.write(bytes(HEADER_SIZE))
+        self._blob = tempfile.TemporaryFile()
+        self._blob_len = 0
+        self._lock = threading.Lock()
+
+        self._names = []
+        self._name_ids = {}
+        self._ordered = True
+        self._last_id = 0
+
+    def intern(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def write(self, call_id, parent_id, name_id, args, in_time, out_time, depth, result):
+        """Queue one finished call; `name_id` comes from `intern`."""
+        pending = self.pending
+        pending.append((call_id, parent_id, name_id, args, in_time, out_time, depth, result))
+        if len(pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Encode the queued calls and write them out."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        pending = self.pending
+        # calls queued while this runs wait for the next flush
+        calls = [pending.popleft() for _ in range(len(pending))]
+        if not calls:
+            return
+        if self.by_id:
+            calls.sort(key=_call_id)
+
+        # values are stored as their repr (a CapturedRepr's is its text);
+        # this loop is where a sink spends its time
+        pack = LENGTH.pack
+        prefix_size = LENGTH.size
+        record = RECORD.pack
+        parts = []
+        add_part = parts.append
+        records = []
+        add_record = records.append
+        breaks = [0]  # positions where the ids stop running on by one, and the end
+        next_id = calls[0][0]
+        off = self._blob_len
+        for call_id, parent_id, name_id, args, in_time, out_time, depth, result in calls:
+            if call_id != next_id:
+                breaks.append(len(records))
+            next_id = call_id + 1
+            args_off = off
+            for arg in args:
+                data = repr(arg).encode("utf-8", "backslashreplace")
+                add_part(pack(len(data)))
+                add_part(data)
+                off += prefix_size + len(data)
+            data = repr(result).encode("utf-8", "backslashreplace")
+            add_part(data)
+            add_record(record(
+                call_id,
+                parent_id or 0,
+                in_time,
+                out_time or 0,
+                depth,
+                name_id,
+                args_off,
+                off - args_off,
+                off,
+                len(data),
+            ))
+            off += len(data)
+        breaks.append(len(calls))
+
+        if self.by_id:
+            self._write_slots(calls, breaks, records)
+        else:
+            if len(breaks) > 2 or calls[0][0] != self.count + 1:
+                self._ordered = False
+            self.count += len(calls)
+            self._file.write(b"".join(records))
+        blob = b"".join(parts)
+        self._blob.write(blob)
+        self._blob_len += len(blob)
+
+    def _write_slots(self, calls, breaks, records):
+        """Write the records of `calls`, sorted by id, to slot id - 1, one write per run of consecutive ids."""
+        self.count += len(calls)
+        self._last_id = max(self._last_id, calls[-1][0])
+        f = self._file
+        for start, stop in zip(breaks, breaks[1:]):
+            f.seek(HEADER_SIZE + (calls[start][0] - 1) * RECORD_SIZE)
+            f.write(b"".join(records[start:stop]))
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush()
+            f = self._file
+
+            if self.by_id:
+                # slots of ids never written read as zeros
+                self._ordered = self._last_id == self.count
+                self.count = self._last_id
+            f.seek(HEADER_SIZE + self.count * RECORD_SIZE)
+            blob_off = f.tell()
+            self._blob.seek(0)
+            shutil.copyfileobj(self._blob, f)
+            self._blob.close()
+
+            names_off = f.tell()
+            names = "\n".join(self._names).encode("utf-8")
+            f.write(names)
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC,
+                VERSION,
+                FLAG_ORDERED if self._ordered else 0,
+                self.count,
+                names_off,
+                len(names),
+                blob_off,
+                self._blob_len,
+            ))
+            f.close()
+            os.replace(self._part_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def save_trace(func, path):
+    """Write the trace recorded on `func` (anything with parent/call_info) to `path`."""
+    if not hasattr(func, "parent") or not hasattr(func, "call_info"):
+        raise RuntimeError("Function is not traced. Use decorator 'trace'.")
+
+    parent = func.parent
+    with TraceWriter(path) as writer:
+        for call_id in sorted(func.call_info):
+            info = func.call_info[call_id]
+            writer.write(
+                call_id,
+                parent[call_id],
+                writer.intern(info["name"]),
+                info["args"],
+                info["in_time"],
+                info["out_time"],
+                info["depth"],
+                info["result"],
+            )
+
+class MappedTrace:
+    """
+    A trace file mapped into memory. `parent` and `call_info` are the same
+    read-only views the compact store uses; fields are read from the mapping
+    on access, so opening a file does not decode its records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, count, names_off, names_len, blob_off, blob_len = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a stacksprout trace file")
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError(f"unsupported trace file version {version}")
+
+        self.count = count
+        self.ordered = bool(flags & FLAG_ORDERED)
+        self.names = bytes(self._mm[names_off:names_off + names_len]).decode("utf-8").split("\n")
+        self.__name__ = self.names[0] if count else "trace"
+
+        view = memoryview(self._mm)
+        records = view[HEADER_SIZE:HEADER_SIZE + count * RECORD_SIZE]
+        if _NATIVE:
+            self._records = records.cast("q")
+        else:
+            self._records = array("q")
+            self._records.frombytes(records)
+            self._records.byteswap()
+        self._blob = view[blob_off:blob_off + blob_len]
+
+        self._index = None if self.ordered else self._build_index()
+
+        self.parent = ParentView(self)
+        self.call_info = CallInfoView(self)
+
+    def _build_index(self):
+        ids = self._records[0::RECORD_FIELDS]
+        return {call_id: i for i, call_id in enumerate(ids)}
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        # views into the mapping must go before it can be closed
+        self.parent = self.call_info = None
+        self._records = self._blob = None
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- read side (used by the mapping views) ----
+    def ids(self):
+        if self.ordered:
+            return iter(range(1, self.count + 1))
+        return iter(self._index)
+
+    def record_index(self, call_id):
+        if self.ordered:
+            if type(call_id) is int and 0 < call_id <= self.count:
+                return call_id - 1
+            raise KeyError(call_id)
+        return self._index[call_id]
+
+    def record_parent(self, i):
+        return self._records[i * RECORD_FIELDS + 1] or None
+
+    def record_field(self, i, key):
+        r = self._records
+        base = i * RECORD_FIELDS
+        if key == "depth":
+            return r[base + 4]
+        if key == "in_time":
+            return r[base + 2]
+        if key == "out_time":
+            return r[base + 3] or None
+        if key == "name":
+            return self.names[r[base + 5]]
+        if key == "args":
+            return self._decode_args(r[base + 6], r[base + 7])
+        if key == "result":
+            off = r[base + 8]
+            return CapturedRepr(bytes(self._blob[off:off + r[base + 9]]).decode("utf-8"))
+        if key == "self_id":
+            return r[base]
+        raise KeyError(key)
+
+    def _decode_args(self, off, length):
+        blob = self._blob
+        end = off + length
+        args = []
+        while off < end:
+            (n,) = LENGTH.unpack_from(blob, off)
+            off += LENGTH.size
+            args.append(CapturedRepr(bytes(blob[off:off + n]).decode("utf-8")))
+            off += n
+        return tuple(args)
+
+def load_trace(path):
+    """Memory-map a trace file written by `save_trace` or a `trace(sink=...)` run."""
+    return MappedTrace(path)
+
+class SinkTrace:
+    """
+    Trace store for `trace(sink=path)`: only running calls are kept in
+    memory; each call is queued for `path` when it returns and written in
+    batches. The session calls `finish` once no root call is running any
+    more, on any thread. Ids are 1..n, so the writer puts every record in
+    its slot by id and the file loads as ordered, without an index,
+    although calls finish out of order.
+
+    The tracer's wrappers keep a running call's fields themselves: they
+    take an id from `new_id` and hand the whole call to `write` when it
+    returns, so nothing is stored per call until then. `begin` and `end`
+    do the same for other callers, keeping the begun calls by id.
+
+    `parent` and `call_info` read the last finished file; `len` is the
+    number of calls begun so far while a run is being written.
+    """
+
+    def __init__(self, path, batch_size=4096):
+        self.path = os.fspath(path)
+        self.batch_size = batch_size
+        self._writer = None
+        self._active = {}
+        self._names = []
+        self._loaded = None
+        self._ids = count(1)
+        self._count = 0
+
+        self.parent = ParentView(self)
+        self.call_info = CallInfoView(self)
+
+    def clear(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._loaded is not None:
+            self._loaded.close()
+            self._loaded = None
+        self._active.clear()
+        self._ids = count(1)
+        self._count = 0
+        self._writer = TraceWriter(self.path, self.batch_size, by_id=True)
+        for name in self._names:
+            self._writer.intern(name)
+
+    def finish(self):
+        """Write out the file; every call begun since `clear` must have ended."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._loaded = None
+
+    def intern(self, name):
+        # every writer interns these names first, in this order
+        if name not in self._names:
+            self._names.append(name)
+        return self._names.index(name)
+
+    def new_id(self):
+        # ids are handed out in order, so the last one is the number begun
+        self._count = call_id = next(self._ids)
+        return call_id
+
+    def write(self, call_id, parent_id, name, args, in_time, out_time, depth, result):
+        """Queue a returned call whose id came from `new_id`."""
+        writer = self._writer
+        pending = writer.pending
+        pending.append((call_id, parent_id, name, args, in_time, out_time, depth, result))
+        if len(pending) >= writer.batch_size:
+            writer.flush()
+
+    def begin(self, parent_id, name, args, in_time, depth):
+        call_id = self.new_id()
+        self._active[call_id] = (parent_id, name, args, in_time, depth)
+        return call_id
+
+    def end(self, call_id, result, out_time):
+        parent_id, name, args, in_time, depth = self._active.pop(call_id)
+        self.write(call_id, parent_id, name, args, in_time, out_time, depth, result)
+
+    # ---- read side: delegate to the finished file ----
+    def _trace(self):
+        if self._loaded is None and self._writer is None and os.path.exists(self.path):
+            self._loaded = MappedTrace(self.path)
+        return self._loaded
+
+    def __len__(self):
+        if self._writer is not None:
+            return self._count
+        trace = self._trace()
+        return len(trace) if trace is not None else 0
+
+    def ids(self):
+        trace = self._trace()
+        return trace.ids() if trace is not None else iter(())
+
+    def record_index(self, call_id):
+        trace = self._trace()
+        if trace is None:
+            raise KeyError(call_id)
+        return trace.record_index(call_id)
+
+    def record_parent(self, i):
+        return self._loaded.record_parent(i)
+
+    def record_field(self, i, key):
+        return self._loaded.record_field(i, key)
@@ -0,0 +1,235 @@
+import threading
+from array import array
+from collections.abc import Mapping
+from itertools import count
+
+# Stores hand out call ids from `begin`, starting at 1 after every clear().
+# begin/end may be called from several threads at once.
+
+class DictTrace:
+    """
+    Default trace store: one dict record per call.
+    `parent` and `call_info` are plain dicts.
+
+    The synchronous wrapper of TraceSession.trace does what begin and end
+    do inline, as they are on its per-call path; keep the two in step.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.call_info = {}
+        self.ids = count(1)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def clear(self):
+        self.parent.clear()
+        self.call_info.clear()
+        self.ids = count(1)
+
+    def evict(self, call_id):
+        del self.parent[call_id]
+        del self.call_info[call_id]
+
+    def intern(self, name):
+        return name
+
+    def begin(self, parent_id, name, args, in_time, depth):
+        call_id = next(self.ids)
+        self.parent[call_id] = parent_id
+        self.call_info[call_id] = {
+            "name": name,
+            "args": args,
+            "in_time": in_time,
+            "out_time": None,
+            "self_id": call_id,
+            "depth": depth,
+            "result": None
+        }
+        return call_id
+
+    def end(self, call_id, result, out_time):
+        info = self.call_info[call_id]
+        info["result"] = result
+        info["out_time"] = out_time
+
+class ColumnarTrace:
+    """
+    Compact trace store: parallel typed arrays, one slot per call.
+    Call ids are 1..n, so call `i` lives at position `i - 1`.
+    Parent id 0 / out_time 0 stand for None.
+
+    Ids come from a counter and each call writes only its own slot, so
+    `begin` takes no lock; the columns grow ahead of the ids in chunks,
+    under a lock only while growing. A slot counts as recorded once its
+    in_time (never 0) is written, which `begin` does last.
+
+    `parent` and `call_info` are read-only mapping views over the columns,
+    so everything that reads a DictTrace reads this one too.
+    """
+
+    def __init__(self):
+        self.parents = array("q")
+        self.in_times = array("q")
+        self.out_times = array("q")
+        self.depths = array("i")
+        self.name_ids = array("i")
+
+        # side tables
+        self.names = []
+        self.args = []
+        self.results = []
+        self._name_ids = {}
+        self._ids = count(1)
+        self._count = 0  # slots known to be written, a prefix of the columns
+        self._lock = threading.Lock()
+
+        self.parent = ParentView(self)
+        self.call_info = CallInfoView(self)
+
+    def __len__(self):
+        n = self._count
+        in_times = self.in_times
+        while n < len(in_times) and in_times[n]:
+            n += 1
+        self._count = n
+        return n
+
+    def clear(self):
+        # names are kept: interned ids are held by live wrappers
+        with self._lock:
+            for column in (self.parents, self.in_times, self.out_times, self.depths, self.name_ids):
+                del column[:]
+            self.args.clear()
+            self.results.clear()
+            self._ids = count(1)
+            self._count = 0
+
+    def intern(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _grow(self, size):
+        """Make room for at least `size` slots; unwritten slots read as an unfinished root."""
+        with self._lock:
+            missing = size - len(self.parents)
+            if missing > 0:
+                missing = max(missing, 256, len(self.parents) // 8)
+                self.args.extend([()] * missing)
+                self.results.extend([None] * missing)
+                # begin checks `parents` without the lock, so it grows last
+                for column in (self.in_times, self.out_times, self.depths, self.name_ids, self.parents):
+                    column.frombytes(bytes(missing * column.itemsize))
+
+    def begin(self, parent_id, name, args, in_time, depth):
+        call_id = next(self._ids)
+        i = call_id - 1
+        if i >= len(self.parents):
+            self._grow(call_id)
+        self.parents[i] = parent_id or 0
+        self.depths[i] = depth
+        self.name_ids[i] = name
+        self.args[i] = args
+        self.in_times[i] = in_time
+        return call_id
+
+    def end(self, call_id, result, out_time):
+        i = call_id - 1
+        self.out_times[i] = out_time
+        self.results[i] = result
+
+    # ---- read side (used by the mapping views) ----
+    def ids(self):
+        return iter(range(1, len(self) + 1))
+
+    def record_index(self, call_id):
+        if type(call_id) is int and 0 < call_id and (call_id <= self._count or call_id <= len(self)):
+            return call_id - 1
+        raise KeyError(call_id)
+
+    def record_parent(self, i):
+        return self.parents[i] or None
+
+    def record_field(self, i, key):
+        if key == "depth":
+            return self.depths[i]
+        if key == "in_time":
+            return self.in_times[i]
+        if key == "out_time":
+            return self.out_times[i] or None
+        if key == "name":
+            return self.names[self.name_ids[i]]
+        if key == "args":
+            return self.args[i]
+        if key == "result":
+            return self.results[i]
+        if key == "self_id":
+            return i + 1
+        raise KeyError(key)
+
+# -------------------------
+# Read-only views over a columnar store
+# -------------------------
+# A store only needs ids(), __len__, record_index(), record_parent()
+# and record_field() to be viewed as `parent` / `call_info`.
+
+RECORD_KEYS = ("name", "args", "in_time", "out_time", "self_id", "depth", "result")
+
+class ParentView(Mapping):
+    """call_id -> parent call_id (or None), read from the store columns."""
+
+    __slots__ = ("_store",)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, call_id):
+        store = self._store
+        return store.record_parent(store.record_index(call_id))
+
+    def __iter__(self):
+        return self._store.ids()
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, call_id):
+        try:
+            self._store.record_index(call_id)
+        except KeyError:
+            return False
+        return True
+
+class CallInfoView(ParentView):
+    """call_id -> CallRecord, read from the store columns."""
+
+    __slots__ = ()
+
+    def __getitem__(self, call_id):
+        store = self._store
+        return CallRecord(store, store.record_index(call_id))
+
+class CallRecord(Mapping):
+    """A single call, decoded field by field on access."""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._store.record_field(self._index, key)
+
+    def __iter__(self):
+        return iter(RECORD_KEYS)
+
+    def __len__(self):
+        return len(RECORD_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
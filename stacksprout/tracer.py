@@ -1,54 +1,559 @@
-from functools import wraps
-
-def trace(func):
-    call_id = 0
-    timer = 0
-    depth = 0
-    stack = []
-    parent = {}
-    call_info = {}
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        nonlocal call_id, timer, depth
-
-        if not stack:
-            call_id = 0
-            timer = 0
-            parent.clear()
-            call_info.clear()
-
-        call_id += 1
-        my_id = call_id
-
-        if stack:
-            parent[my_id] = stack[-1]
+import random
+import threading
+from collections import deque
+from contextvars import ContextVar
+from functools import partial, wraps
+from itertools import count
+from .trace_store import DictTrace, ColumnarTrace
+from .capture_policy import resolve_capture
+from .timing import CLOCKS, CallTimes
+
+TRACE_MODES = ("head", "ring", "sample")
+
+# inspect.CO_COROUTINE; inspect itself takes longer to import than the
+# rest of the tracer together
+_CO_COROUTINE = 0x80
+
+# call id in the frame of a call that is not being recorded
+_SKIPPED = object()
+# frame a root call is recorded under: no parent, depth 0
+_ROOT = (None, 0)
+
+class _CompletionRing:
+    """
+    Finished calls in the order they returned. A call returns after all of
+    its children, so evicting from the front only ever removes calls whose
+    children are already gone - the kept calls always form a tree.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.done = deque()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.done.clear()
+
+    def completed(self, call_id):
+        self.done.append(call_id)
+
+    def make_room(self, limit):
+        store = self.store
+        done = self.done
+        with self.lock:
+            while len(store) >= limit and done:
+                store.evict(done.popleft())
+            return len(store) < limit
+
+class _PathSampler:
+    """
+    Samples root-to-leaf paths. A call that returns without recorded
+    children is kept with probability `rate`; a call with children is
+    kept if any of them was, and the root always. A call that is not kept
+    is evicted as it returns, so the store only holds the kept calls and
+    the running ones.
+    """
+
+    def __init__(self, store, rate):
+        self.store = store
+        self.rate = rate
+        self.kept = {}  # running call id -> whether a recorded child of it was kept
+
+    def clear(self):
+        self.kept.clear()
+
+    def opened(self, parent_id):
+        if parent_id is not None:
+            self.kept.setdefault(parent_id, False)
+
+    def completed(self, call_id):
+        kept = self.kept.pop(call_id, None)
+        parent_id = self.store.parent[call_id]
+        if parent_id is None:
+            return
+        if kept is None:
+            # a leaf: its path is rolled for here
+            kept = random.random() < self.rate
+        if kept:
+            self.kept[parent_id] = True
+        else:
+            self.store.evict(call_id)
+
+def _is_coroutine_function(func):
+    """inspect.iscoroutinefunction for plain functions, bound methods and partials of them."""
+    while isinstance(func, partial):
+        func = func.func
+    code = getattr(getattr(func, "__func__", func), "__code__", None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
+
+class _CallStacks(threading.local):
+    """Per-thread frames (call id, depth) of the running synchronous calls, innermost last."""
+
+    def __init__(self):
+        self.calls = []
+
+class TraceSession:
+    """
+    One trace shared by any number of traced functions: one id space, one
+    timer and one call stack. Use it for mutual recursion or any group of
+    functions that call each other:
+
+        session = TraceSession()
+
+        @session.trace
+        def is_even(n): ...
+
+        @session.trace
+        def is_odd(n): ...
+
+        is_even(10)
+        visualize_tree(session)
+
+    `trace(func)` on its own simply wraps `func` in a private session.
+    Options are the ones documented on `trace`.
+
+    The running calls are kept as frames (id, depth). Synchronous calls
+    push theirs on a per-thread stack, which costs a list append and pop
+    per call. A coroutine's call can be suspended, so its frame goes in a
+    ContextVar instead, giving each asyncio task its own; tasks created
+    inside a traced coroutine inherit it and become children of that call.
+    The innermost running call is the deeper of the two (see
+    current_frame); until a coroutine function is traced in the session
+    the ContextVar stays empty, and synchronous calls do not read it. Ids
+    come from the store and times from a shared counter, neither needs a
+    lock. The lock only guards root entry/exit: the trace is reset when a
+    root call starts while no other root is running anywhere, so
+    concurrent roots end up side by side as separate trees of one trace.
+    """
+
+    def __init__(
+        self,
+        name="session",
+        *,
+        compact=False,
+        max_calls=None,
+        mode="head",
+        sample_rate=None,
+        max_depth=None,
+        capture=None,
+        sink=None,
+        accumulate=False,
+        timing=None,
+    ):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"mode must be one of {TRACE_MODES}, got {mode!r}")
+        if mode in ("ring", "sample") and max_calls is None:
+            raise ValueError(f"mode={mode!r} needs max_calls")
+        if mode in ("ring", "sample") and compact:
+            raise ValueError(f"mode={mode!r} evicts calls and needs the dict store (compact=False)")
+        if sink is not None and (compact or mode != "head"):
+            raise ValueError("sink= writes calls out as they finish; it cannot be combined with compact or mode='ring'/'sample'")
+        if sink is not None and accumulate:
+            raise ValueError("sink= finishes its file when the last root call returns; it cannot be combined with accumulate=True")
+        if mode == "sample" and not (sample_rate is not None and 0 < sample_rate <= 1):
+            raise ValueError("mode='sample' needs 0 < sample_rate <= 1")
+        if timing is not None and timing not in CLOCKS:
+            raise ValueError(f"timing must be one of {tuple(CLOCKS)} or None, got {timing!r}")
+        if timing is not None and (sink is not None or mode != "head"):
+            raise ValueError("timing= keeps every call's clock readings in memory, not in trace files; it cannot be combined with sink= or mode='ring'/'sample'")
+
+        self.__name__ = name
+
+        self.sink = sink
+        if sink is not None:
+            # trace files are only loaded for sink=
+            from .trace_file import SinkTrace
+            self.store = SinkTrace(sink)
+        elif compact:
+            self.store = ColumnarTrace()
         else:
-            parent[my_id] = None
-
-        timer += 1
-        depth += 1
-        call_info[my_id] = {
-            "name": func.__name__,
-            "args": args, 
-            "in_time": timer,
-            "out_time": None,
-            "self_id": my_id,
-            "depth": depth,
-            "result": None
-        }
-
-        stack.append(my_id)
+            self.store = DictTrace()
+        self.parent = self.store.parent
+        self.call_info = self.store.call_info
+
+        self.accumulate = accumulate
+        self.max_calls = max_calls
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_depth = max_depth
+        self.capture = resolve_capture(capture)
+        self.ring = _CompletionRing(self.store) if mode == "ring" else None
+        self.paths = _PathSampler(self.store, sample_rate) if mode == "sample" else None
+        self.timing = timing
+        self.call_times = CallTimes(timing) if timing is not None else None
+        self._overhead = None
+        self._stacks = _CallStacks()
+        # set once a coroutine function is traced: only then can the
+        # ContextVar hold a frame
+        self.has_coroutines = False
+
+        self.clock = count(1)
+        self.roots = 0
+        self.lock = threading.Lock()
+        self.frame = ContextVar(f"stacksprout_{name}", default=None)
+
+    def clear(self):
+        """Forget everything recorded so far."""
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.store.clear()
+        self.clock = count(1)
+        if self.ring is not None:
+            self.ring.clear()
+        if self.paths is not None:
+            self.paths.clear()
+        if self.call_times is not None:
+            self.call_times.clear()
+
+    def enter_root(self):
+        with self.lock:
+            if not self.roots and not self.accumulate:
+                self._reset()
+            self.roots += 1
+
+    def exit_root(self):
+        with self.lock:
+            self.roots -= 1
+            if not self.roots and self.sink is not None:
+                # no call of this session is running: the file is complete
+                self.store.finish()
+
+    def current_frame(self):
+        """
+        (call id, depth) of the innermost running call of this thread or
+        asyncio task, None outside any. Both sources only hold calls that
+        enclose the code running now, so the deeper frame is the innermost.
+        """
+        calls = self._stacks.calls
+        frame = self.frame.get()
+        if calls and (frame is None or calls[-1][1] >= frame[1]):
+            return calls[-1]
+        return frame
+
+    def run_root(self, wrapper, args, kwargs):
+        """
+        Call `wrapper` as a root call. The trace is set up here, and the
+        wrapper records the call under _ROOT, so root-only work stays off
+        the path every other call takes.
+        """
+        calls = self._stacks.calls
+        self.enter_root()
+        calls.append(_ROOT)
         try:
-            res = func(*args, **kwargs)
-            call_info[my_id]["result"] = res
-            return res
+            return wrapper(*args, **kwargs)
         finally:
-            timer += 1
-            depth -= 1
-            call_info[my_id]["out_time"] = timer
-            stack.pop()
-            
-    wrapper.parent = parent
-    wrapper.call_info = call_info
-    return wrapper
\ No newline at end of file
+            calls.pop()
+            self.exit_root()
+
+    async def run_root_async(self, wrapper, args, kwargs):
+        """`run_root` for the wrapper of a coroutine function."""
+        self.enter_root()
+        token = self.frame.set(_ROOT)
+        try:
+            return await wrapper(*args, **kwargs)
+        finally:
+            self.frame.reset(token)
+            self.exit_root()
+
+    def timing_overhead(self, calls=1000, rounds=5):
+        """
+        Calibrate the clock readings of this session's wrapper, once:
+        returns (inner, per_call) in ns. `inner` is what a call's own
+        reading adds to it, `per_call` what every traced call adds to the
+        reading of the calls above it. (0, 0) for a session without timing.
+        """
+        if self.timing is None:
+            return 0, 0
+        if self._overhead is None:
+            probe = TraceSession(
+                "calibration",
+                compact=isinstance(self.store, ColumnarTrace),
+                capture=self.capture,
+                timing=self.timing,
+            )
+
+            @probe.trace
+            def leaf():
+                pass
+
+            @probe.trace
+            def fan(k):
+                for _ in range(k):
+                    leaf()
+
+            def plain():
+                pass
+
+            clock = CLOCKS[self.timing]
+            inner = per_call = float("inf")
+            for _ in range(rounds):
+                fan(calls)
+                times = probe.call_times
+                leaves = sorted(times.elapsed(u) for u in range(2, calls + 2))
+                start = clock()
+                for _ in range(calls):
+                    plain()
+                baseline = clock() - start
+                inner = min(inner, leaves[len(leaves) // 2])
+                per_call = min(per_call, (times.elapsed(1) - baseline) / calls)
+            self._overhead = (inner, max(0.0, per_call))
+        return self._overhead
+
+    def trace(self, func):
+        """Decorator: record calls of `func` into this session."""
+        session = self
+        store = self.store
+        name = store.intern(func.__name__)
+        begin = store.begin
+        end = store.end
+        # the default store's records are written by the sync wrapper itself
+        parents = store.parent if type(store) is DictTrace else None
+        records = store.call_info
+        # a sink is handed each call whole when it returns
+        new_id = store.new_id if self.sink is not None else None
+        write = store.write if self.sink is not None else None
+
+        stacks = self._stacks
+        set_frame = self.frame.set
+        reset_frame = self.frame.reset
+
+        ring = self.ring
+        paths = self.paths
+        keep = self.capture
+        bounded = self.max_calls is not None or self.max_depth is not None
+        limit = self.max_calls if self.max_calls is not None else float("inf")
+        deepest = self.max_depth if self.max_depth is not None else float("inf")
+        times = self.call_times
+        clock = CLOCKS[self.timing] if times is not None else None
+
+        def admit(parent_id, depth):
+            if depth > deepest:
+                return False
+            if ring is not None:
+                return ring.make_room(limit)
+            return len(store) < limit
+
+        if _is_coroutine_function(func):
+            self.has_coroutines = True
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                current = session.current_frame()
+                if current is None:
+                    return await session.run_root_async(wrapper, args, kwargs)
+                parent_id, depth = current
+                depth += 1
+
+                # inside a call that is not being recorded
+                if parent_id is _SKIPPED:
+                    return await func(*args, **kwargs)
+                if bounded and not admit(parent_id, depth):
+                    token = set_frame((_SKIPPED, depth))
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        reset_frame(token)
+
+                if paths is not None:
+                    paths.opened(parent_id)
+                recorded = args if keep is None else tuple(map(keep, args))
+                if write is not None:
+                    my_id = new_id()
+                    in_time = next(session.clock)
+                else:
+                    my_id = begin(parent_id, name, recorded, next(session.clock), depth)
+                token = set_frame((my_id, depth))
+                res = None
+                start = clock() if clock is not None else 0
+                try:
+                    res = await func(*args, **kwargs)
+                    return res
+                finally:
+                    if clock is not None:
+                        times.record(my_id, start, clock())
+                    reset_frame(token)
+                    if write is not None:
+                        write(my_id, parent_id, name, recorded, in_time, next(session.clock), depth, res if keep is None else keep(res))
+                    else:
+                        end(my_id, res if keep is None else keep(res), next(session.clock))
+                    if ring is not None:
+                        ring.completed(my_id)
+                    elif paths is not None:
+                        paths.completed(my_id)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                # the per-call path: the innermost frame is the top of the
+                # thread's stack unless a traced coroutine may be running
+                calls = stacks.calls
+                if calls and not session.has_coroutines:
+                    current = calls[-1]
+                else:
+                    current = session.current_frame()
+                    if current is None:
+                        return session.run_root(wrapper, args, kwargs)
+                parent_id, depth = current
+                depth += 1
+
+                # inside a call that is not being recorded
+                if parent_id is _SKIPPED:
+                    return func(*args, **kwargs)
+                if bounded and not admit(parent_id, depth):
+                    calls.append((_SKIPPED, depth))
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        calls.pop()
+
+                if paths is not None:
+                    paths.opened(parent_id)
+                recorded = args if keep is None else tuple(map(keep, args))
+                if parents is not None:
+                    # DictTrace.begin, inlined
+                    my_id = next(store.ids)
+                    parents[my_id] = parent_id
+                    records[my_id] = info = {
+                        "name": name,
+                        "args": recorded,
+                        "in_time": next(session.clock),
+                        "out_time": None,
+                        "self_id": my_id,
+                        "depth": depth,
+                        "result": None
+                    }
+                elif write is not None:
+                    my_id = new_id()
+                    in_time = next(session.clock)
+                else:
+                    my_id = begin(parent_id, name, recorded, next(session.clock), depth)
+                calls.append((my_id, depth))
+                res = None
+                start = clock() if clock is not None else 0
+                try:
+                    res = func(*args, **kwargs)
+                    return res
+                finally:
+                    if clock is not None:
+                        times.record(my_id, start, clock())
+                    calls.pop()
+                    if parents is not None:
+                        # DictTrace.end, inlined
+                        info["result"] = res if keep is None else keep(res)
+                        info["out_time"] = next(session.clock)
+                    elif write is not None:
+                        write(my_id, parent_id, name, recorded, in_time, next(session.clock), depth, res if keep is None else keep(res))
+                    else:
+                        end(my_id, res if keep is None else keep(res), next(session.clock))
+                    if ring is not None:
+                        ring.completed(my_id)
+                    elif paths is not None:
+                        paths.completed(my_id)
+
+        wrapper.parent = self.parent
+        wrapper.call_info = self.call_info
+        wrapper.trace_store = store
+        wrapper.trace_session = self
+        wrapper.call_times = times
+        return wrapper
+
+def trace(
+    func=None,
+    *,
+    session=None,
+    compact=False,
+    max_calls=None,
+    mode="head",
+    sample_rate=None,
+    max_depth=None,
+    capture=None,
+    sink=None,
+    accumulate=False,
+    timing=None,
+):
+    """
+    Record every call of `func` as a call tree.
+
+    Use as `@trace` or `@trace(compact=True)`. The compact store keeps calls
+    in typed arrays instead of one dict per call, which is much smaller for
+    traces with millions of calls.
+
+    Pass `session=` (a TraceSession) to record several functions into one
+    trace; the options below are then set on the session instead.
+
+    Bounding options (the function itself always runs to completion):
+      max_calls    -- record at most this many calls
+      mode         -- "head":   keep the first `max_calls` calls
+                      "ring":   keep the most recent calls, evicting the
+                                calls that finished first
+                      "sample": keep each root-to-leaf path with
+                                probability `sample_rate`, at most
+                                `max_calls` calls
+      max_depth    -- do not record calls deeper than this
+
+    A call that is not recorded is skipped together with its whole subtree,
+    so every recorded call still has its recorded parent.
+
+    Tracing is thread-safe and works for `async def` functions: every
+    thread or task that enters the function at the top starts its own root
+    call, and roots that overlap in time are kept as separate trees.
+    A root call that starts while nothing is running replaces the previous
+    trace; pass `accumulate=True` to keep every root (e.g. for a thread
+    pool) until `session.clear()`.
+
+    Capture option:
+      capture      -- how args and results are kept: None keeps the live
+                      objects, "repr" a truncated repr, "summary" type and
+                      length, "weakref" a weak reference where possible, or
+                      any callable `value -> recorded value` (see
+                      `stacksprout.capture_policy`). Applied once per call.
+
+    Streaming option:
+      sink         -- path of a trace file; finished calls are written to it
+                      in batches as they return and only the running calls
+                      stay in memory. Read it back with `load_trace(path)`.
+                      The file is finished once no root call is running,
+                      so `accumulate` is not available with it.
+
+    Timing option:
+      timing       -- "wall" (time.perf_counter_ns) or "cpu"
+                      (time.process_time_ns) clock readings around every
+                      recorded call, in `func.call_times`. TimeProfile(func)
+                      turns them into self/total time with the tracer's
+                      overhead subtracted. The readings of every call stay
+                      in memory, so `sink` and `mode="ring"`/`"sample"`
+                      are not available with it.
+    """
+    options = dict(
+        compact=compact,
+        max_calls=max_calls,
+        mode=mode,
+        sample_rate=sample_rate,
+        max_depth=max_depth,
+        capture=capture,
+        sink=sink,
+        accumulate=accumulate,
+        timing=timing,
+    )
+    if func is None:
+        return lambda f: trace(f, session=session, **options)
+
+    if session is None:
+        return TraceSession(func.__name__, **options).trace(func)
+
+    if options != _DEFAULT_OPTIONS:
+        raise ValueError("trace options go on the TraceSession when session= is given")
+    return session.trace(func)
+
+_DEFAULT_OPTIONS = dict(
+    compact=False,
+    max_calls=None,
+    mode="head",
+    sample_rate=None,
+    max_depth=None,
+    capture=None,
+    sink=None,
+    accumulate=False,
+    timing=None,
+)
@@ -1,24 +1,66 @@
+from array import array
 from collections import defaultdict
-from sortedcontainers import SortedList
+from .layout import TreeLayout
+
+class SparseGrid:
+    """
+    Grid of call ids by (depth row, column) storing only occupied cells:
+    one {col: id} dict per row, so memory follows the number of calls,
+    not rows x width. grid[row].get(col) is the id there (None if free).
+    """
+
+    def __init__(self, n_rows, width):
+        self.rows = [{} for _ in range(n_rows)]
+        self.width = width
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row):
+        return self.rows[row]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def clear(self):
+        for row in self.rows:
+            row.clear()
+
+class FreeColumns:
+    """
+    Free columns 0..width-1 of one row. `nearest(c)` finds the free column
+    closest to c (the left one on a tie) with two union-find "next free"
+    maps, one per direction, so a row costs O(taken columns), not O(width).
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.right = {}  # taken col -> some col further right to try
+        self.left = {}  # taken col -> some col further left to try
+
+    @staticmethod
+    def _find(links, c):
+        root = c
+        while root in links:
+            root = links[root]
+        while c != root:  # path compression
+            links[c], c = root, links[c]
+        return root
+
+    def nearest(self, preferred):
+        right = self._find(self.right, preferred)
+        left = self._find(self.left, preferred - 1)
+        if right >= self.width:
+            return left
+        if left < 0:
+            return right
+        return left if abs(left - preferred) <= abs(right - preferred) else right
+
+    def take(self, c):
+        self.right[c] = c + 1
+        self.left[c] = c - 1
 
 def generate_basic_tree_grid(parent, call_info):
-    class Node:
-        def __init__(self, row, col):
-            self.edges = []
-            self.id = None # free
-            self.row = row
-            self.col = col
-        def free(self):
-            return self.id == None
-        def set_id(self, id):
-            self.id = id
-        def add_edge(self, to):
-            self.edges.append(to)
-        def __str__(self):
-            return str(self.id)
-        def __repr__(self):
-            return str(self.id)
-
     max_depth = 0
     for value in call_info.values():
         max_depth = max(value['depth'], max_depth)
@@ -26,14 +68,10 @@ def generate_basic_tree_grid(parent, call_info):
     for value in call_info.values():
         freq[value['depth']] += 1
 
-    grid = [[Node(r, c) for c in range(max(freq)+1)]
-            for r in range(max_depth+1)]
     width = max(freq) + 1
-    free_cols = [
-        SortedList(range(width))
-        for _ in range(max_depth + 1)
-    ]
-    
+    grid = SparseGrid(max_depth + 1, width)
+    free_cols = [FreeColumns(width) for _ in range(max_depth + 1)]
+
     adj = defaultdict(list)
     for node, p in parent.items():
         if p is not None:
@@ -42,33 +80,19 @@ def generate_basic_tree_grid(parent, call_info):
 
     postorder = []
 
-    visited = [False for _ in range(len(parent)+1)]
+    visited = set()  # ids can have gaps in bounded traces
     pos = {}
     def place_node(u, parent):
         depth = call_info[u]['depth']
         preferred = 0 if parent is None else pos[parent][1]
 
         cols = free_cols[depth]
+        c = cols.nearest(preferred)
+        cols.take(c)
 
-        i = cols.bisect_left(preferred)
-
-        if i == 0:
-            c = cols[0]
-        elif i == len(cols):
-            c = cols[-1]
-        else:
-            left = cols[i - 1]
-            right = cols[i]
-            c = left if abs(left - preferred) <= abs(right - preferred) else right
-
-        cols.remove(c)
-
-        grid[depth][c].set_id(u)
+        grid[depth][c] = u
         pos[u] = (depth, c)
 
-        if parent is not None:
-            grid[depth][c].add_edge(parent)
-
     def DFS_iterative(root):
         stack = [(root, None, False)]  # (node, parent, processed)
 
@@ -76,19 +100,22 @@ def generate_basic_tree_grid(parent, call_info):
             u, p, processed = stack.pop()
 
             if not processed:
-                visited[u] = True
+                visited.add(u)
                 place_node(u, p)
 
                 # Postorder marker
                 stack.append((u, p, True))
 
                 for v in adj[u]:
-                    if not visited[v]:
+                    if v not in visited:
                         stack.append((v, u, False))
             else:
                 postorder.append(u)
 
-    DFS_iterative(1)
+    # roots that ran concurrently are separate trees of the same trace
+    for u, p in parent.items():
+        if p is None:
+            DFS_iterative(u)
 
     return grid, pos, postorder, adj
 
@@ -98,18 +125,8 @@ def center_tree_grid(grid, parent, pos, postorder):
         if p is not None:
             children[p].append(child)
 
-    max_depth = len(grid) - 1
-    width = len(grid[0])
-
-    for row in grid:
-        for cell in row:
-            cell.id = None
-            cell.edges = []
-
-    free_cols = [
-        SortedList(range(width))
-        for _ in range(max_depth + 1)
-    ]
+    grid.clear()
+    free_cols = [FreeColumns(grid.width) for _ in range(len(grid))]
 
     for u in postorder:
         r, old_c = pos[u]
@@ -117,28 +134,10 @@ def center_tree_grid(grid, parent, pos, postorder):
         cols = [pos[v][1] for v in children.get(u, []) if v in pos]
         target = old_c if not cols else sum(cols) // len(cols)
 
-        cols_free = free_cols[r]
-        i = cols_free.bisect_left(target)
-
-        if i == 0:
-            c = cols_free[0]
-        elif i == len(cols_free):
-            c = cols_free[-1]
-        else:
-            left = cols_free[i - 1]
-            right = cols_free[i]
-            c = left if abs(left - target) <= abs(right - target) else right
-
-        cols_free.remove(c)
+        c = free_cols[r].nearest(target)
+        free_cols[r].take(c)
         pos[u] = (r, c)
-        grid[r][c].set_id(u)
-
-    for u, (r_u, c_u) in pos.items():
-        p = parent.get(u)
-        if p is not None:
-            grid[r_u][c_u].add_edge(p)
-        for ch in children.get(u, []):
-            grid[r_u][c_u].add_edge(ch)
+        grid[r][c] = u
 
     return grid, pos
 
@@ -149,10 +148,26 @@ def generate_tree_grid(parent, call_info, center=True):
         grid, pos = center_tree_grid(grid, parent, pos, postorder)
     return grid, adj, pos
 
+def grid_layout(parent, call_info):
+    """The greedy grid placement as a TreeLayout (the grid is kept on `.grid`)."""
+    grid, _, pos = generate_tree_grid(parent, call_info, center=True)
+    ids = list(pos)
+    tree_layout = TreeLayout(
+        array("q", ids),
+        array("i", [pos[u][0] for u in ids]),
+        array("d", [pos[u][1] for u in ids]),
+        grid=grid,
+    )
+    # the grid may have free columns past the last node
+    tree_layout.n_rows = len(grid)
+    tree_layout.n_cols = grid.width
+    return tree_layout
+
 def test_debug(grid):
     for r, row in enumerate(grid):
         print(f"depth {r}:", end=" ")
-        for cell in row:
-            s = str(cell.id) if cell.id else '.'
+        for c in range(grid.width):
+            cell = row.get(c)
+            s = str(cell) if cell else '.'
             print( s, end=" "*(4-len(s)) )
         print()
\ No newline at end of file
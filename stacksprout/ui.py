@@ -6,6 +6,9 @@ from .animation import (
     show_all_nodes_active,
 )
 from .interactions import on_tree_select
+from .hierarchy import LazyHierarchy
+from .icicle import draw_icicle
+from .metrics import phase
 
 def set_frame_enabled(frame, enabled):
     state = "normal" if enabled else "disabled"
@@ -17,15 +20,13 @@ def toggle_mode(context):
     Toggle between animation and static views.
     This uses only the context + UI handles contained in context.ui.
     """
-    if context.mode["large_graph"]:
-        return
-
     context.mode["view_mode"] = 1 - context.mode["view_mode"]
     anim = context.mode["view_mode"] == 1
 
     if anim:
-        # reset animation state and start animate — animate is expected to read context.animation
+        # the static view restyled every node, so the first frame is a full redraw
         context.anim.reset()
+        context.anim.rendered = None
         animate(context)
     else:
         show_all_nodes_active(context.canvas, context.ui.get("graph_config", {}))
@@ -104,14 +105,9 @@ def build_ui(root, context, font):
     # ---- Hierarchy view (top-right) ----
     hierarchy = ttk.Treeview(root, selectmode='browse')
 
-    stack = [(1, "")]
-    while stack:
-        current_node, parent = stack.pop() 
-        node_id = hierarchy.insert(parent, "end", values=(current_node,), iid=f"item_{current_node}",
-                    text=f"{current_node} - {context.call_info[current_node]["name"]}({context.call_info[current_node]["args"]})")
-        for child, parent_of_child in context.parent.items():
-            if parent_of_child == current_node:
-                stack.append((child, node_id))
+    # rows are inserted as branches are expanded, not all up front
+    with phase(context, "hierarchy"):
+        hierarchy_rows = LazyHierarchy(hierarchy, context.parent, context.call_info)
 
     hierarchy.place(relx=0.0, rely=0.0, anchor="nw")
 
@@ -156,15 +152,20 @@ def build_ui(root, context, font):
     center_group.pack(side="left", padx=16)
     right_group.pack(side="right")
 
+    # ---- Icicle graph of call times (timed traces only) ----
+    if context.profile is not None:
+        icicle_height = 160
+        icicle_canvas = tk.Canvas(root, height=icicle_height, bg=context.style["bg_color"], highlightthickness=0)
+        icicle_canvas.pack(side="bottom", fill="x")
+        with phase(context, "icicle"):
+            draw_icicle(icicle_canvas, context, int(context.canvas.cget("width")), icicle_height)
+
     # ---- Mode toggle ----
     toggle_mode_btn = ttk.Button(
         left_group,
         text="Animation",
         command=lambda: toggle_mode(context),
     )
-    if context.mode["large_graph"]:
-        toggle_mode_btn.state(["disabled"])
-
     toggle_mode_btn.pack()
 
     # ---- Playback controls ----
@@ -231,6 +232,13 @@ def build_ui(root, context, font):
     # ---- Timeline scrubber ----
     anim_timeline_scrub_var = tk.DoubleVar(value=context.anim.cursor)
 
+    # drag events arrive faster than frames; draw only the latest cursor
+    scrub_job = {"id": None}
+
+    def render_scrub():
+        scrub_job["id"] = None
+        animate(context)
+
     def on_anim_timeline_scrub_change(_):
         new_cursor = int(anim_timeline_scrub_var.get())
         if new_cursor != context.anim.cursor:
@@ -240,7 +248,8 @@ def build_ui(root, context, font):
                 {"cursor": context.anim.cursor, "threshold": context.anim.threshold}
             )
             context.anim.play(force_set=True)
-            animate(context)
+            if scrub_job["id"] is None:
+                scrub_job["id"] = root.after_idle(render_scrub)
 
     anim_timeline_scrub_scale = ttk.Scale(
         right_group,
@@ -272,6 +281,7 @@ def build_ui(root, context, font):
             "play_button": play_anim_btn,
             "info_text": info_text,
             "hierarchy_treeview": hierarchy,
+            "hierarchy_rows": hierarchy_rows,
         }
     )
 
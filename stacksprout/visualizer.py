@@ -1,9 +1,16 @@
-from .tree_to_grid import generate_tree_grid
+from .placement import LAYOUTS, place_calls
 from .graph_renderer import draw_nodes, draw_edges
 from .ui import build_ui
 from .layout import LayoutEngine
+from .geometry import Geometry
 from .animation import show_all_nodes_active, AnimationController
-from .interactions import bind_keys
+from .timeline import TimelineIndex
+from .interactions import bind_keys, build_cull_index
+from .lod import LodRenderer
+from .dedupe import CallDag
+from .scene import reset_scene
+from .timing import TimeProfile
+from .metrics import as_metrics, phase, canvas_item_counts
 
 import tkinter as tk
 import tkinter.font as tkfont
@@ -37,67 +44,55 @@ class _VisualizationContext:
         self.selected_node = {"id": None}
         self.id_to_index = {}
 
-        # graph structure (handy to have on context)
-        self.tree_grid = None
-        self.adj = None
-        self.pos = None
-    
-def visualize_tree(func):
-    if not hasattr(func, "parent") or not hasattr(func, "call_info"):
-        raise RuntimeError("Function is not traced. Use decorator 'trace'.")
-    if not func.parent or not func.call_info:
-        print("No calls were traced. Try running the function.")
-        return
-
-    # attempt dpi awareness on Windows (harmless if fails)
-    try:
-        ctypes.windll.shcore.SetProcessDpiAwareness(1)
-    except Exception:
-        pass
+        # call id -> calls sharing its subtree, for a deduplicated trace
+        self.multiplicity = {}
 
-    root = tk.Tk()
-    root.tk.call("tk", "scaling", 1.5)
-    root.title(f"StackSprout - Recursion Tree for {func.__name__}")
+        # self/total call times, for a trace recorded with timing=
+        self.profile = None
 
-    # Create context
-    context = _VisualizationContext()
-    
-    # -------------------------
-    # Local layout / style constants (keep them local)
-    # -------------------------
-    cell_offset, diameter = 30, 50
-    context.style["canvas_font_medium"] = tkfont.Font(
-        family="Segoe UI", size=diameter // 5
-    )
-    context.style["canvas_font_small"] = tkfont.Font(
-        family="Segoe UI", size=diameter // 7
-    )
+        # graph structure (handy to have on context)
+        self.tree_grid = None  # only for the "grid" layout
+        self.pos = None  # TreeLayout: call id -> (row, col)
+        self.geometry = None  # node centres + edge endpoints, world coordinates
 
-    context.style["bg_color"] = "#f2f2ff"
+        # sorted enter/exit events + checkpoints, built once
+        self.timeline = None
 
-    context.style["ui_font_medium"] = tkfont.Font(family="Segoe UI", size=10)
-    context.style["base_font_medium"] = context.style["canvas_font_medium"].cget("size")
-    context.style["base_font_small"] = context.style["canvas_font_small"].cget("size")
+        # level-of-detail renderer, only for large graphs
+        self.lod = None
 
-    canvas_width, canvas_height = 800, 600
+        # ViewMetrics when the window is instrumented
+        self.metrics = None
+    
 
-    # -------------------------
-    # Fill context and populate shared state
-    # -------------------------
-    context.canvas = tk.Canvas(root, width=canvas_width, height=canvas_height, bg=context.style["bg_color"])
+def build_graph(context, func, layout, diameter, cell_offset, canvas_width, canvas_height):
+    """
+    Lay out the trace on `func` and draw it on context.canvas: everything
+    visualize_tree does between creating the canvas and building the UI.
+    context.canvas and the canvas fonts in context.style must be set.
+    Returns the zoom limits.
+    """
+    reset_scene()
     context.call_info = func.call_info
     context.parent = func.parent
-
-    # Build grid/graph and keep it on context (these are structural, not UI constants)
-    tree_grid, adj, pos = generate_tree_grid(context.parent, context.call_info, center=True)
-    context.tree_grid = tree_grid
-    context.adj = adj
-    context.pos = pos
+    context.multiplicity = getattr(func, "multiplicity", {})
+    if getattr(func, "call_times", None) is not None:
+        with phase(context, "profile"):
+            context.profile = TimeProfile(func)
+
+    # Place the calls and keep the result on context (structural, not UI constants)
+    with phase(context, "layout"):
+        tree_layout = place_calls(context.parent, context.call_info, layout)
+    context.tree_grid = tree_layout.grid
+    context.pos = tree_layout
+    context.id_to_index = tree_layout
 
     # Layout engine
-    layout = LayoutEngine(tree_grid, diameter, cell_offset)
-    layout.compute_centering(canvas_width, canvas_height)
-    context.layout = layout
+    with phase(context, "geometry"):
+        layout = LayoutEngine(tree_layout, diameter, cell_offset)
+        layout.compute_centering(canvas_width, canvas_height)
+        context.layout = layout
+        context.geometry = Geometry(tree_layout, context.parent, layout)
 
     # Zoom / drawing limits (locals)
     zoom_config = {
@@ -112,15 +107,11 @@ def visualize_tree(func):
     if n > zoom_config["max_draw_nodes"]:
         context.mode["large_graph"] = True
 
-    # Build animation events if graph small enough
-    events = []
-    if not context.mode["large_graph"]:
-        for info in context.call_info.values():
-            events.append({"time": info["in_time"], "type": 0, "info": info})
-            events.append({"time": info["out_time"], "type": 1, "info": info})
-        events.sort(key=lambda e: e["time"])
+    # Build the animation timeline (sorted events + state checkpoints) once
+    with phase(context, "timeline"):
+        context.timeline = TimelineIndex(context.call_info)
 
-    context.anim = AnimationController(context, len(events))
+    context.anim = AnimationController(context, len(context.timeline))
 
     # keep graph_config accessible to callbacks via context.ui
     context.ui["graph_config"] = {
@@ -130,7 +121,7 @@ def visualize_tree(func):
         "completed_node_oval": {"outline": "#999"},
         "completed_node_label1": {"fill": "#666"},
         "completed_node_label2": {"fill": "#666"},
-        "future_node_oval": {"outline": context.style["bg_color"]},
+        "future_node_oval": {"outline": context.style["bg_color"], "fill": context.style["bg_color"]},
         "future_node_label1": {"fill": context.style["bg_color"]},
         "future_node_label2": {"fill": context.style["bg_color"]},
         "active_edge": {"fill": "black"},
@@ -138,22 +129,104 @@ def visualize_tree(func):
         "future_edge": {"fill": context.style["bg_color"]},
     }
 
-    # selection lookup (id -> grid coordinate)
-    for row in range(1, len(tree_grid)):
-        for col in range(len(tree_grid[row])):
-            context.id_to_index[tree_grid[row][col].id] = (row, col)
-
     # -------------------------
     # Draw graph
     # -------------------------
-    draw_edges(context)
-    draw_nodes(context)
-    show_all_nodes_active(context.canvas, context.ui["graph_config"])
-    
+    if context.mode["large_graph"]:
+        # too many calls to draw one by one: start zoomed out on aggregates
+        with phase(context, "lod"):
+            context.lod = LodRenderer(context)
+            fit = context.lod.fit_view(canvas_width, canvas_height)
+            zoom_config["min_scale"] = min(zoom_config["min_scale"], fit)
+            context.style["canvas_font_medium"].configure(size=max(2, int(context.style["base_font_medium"] * fit)))
+            context.style["canvas_font_small"].configure(size=max(1, int(context.style["base_font_small"] * fit)))
+            context.lod.render()
+    else:
+        with phase(context, "draw_edges"):
+            draw_edges(context)
+        with phase(context, "draw_nodes"):
+            draw_nodes(context)
+            show_all_nodes_active(context.canvas, context.ui["graph_config"])
+        with phase(context, "cull_index"):
+            build_cull_index(layout, context.geometry)
+
+    if context.metrics is not None:
+        context.metrics.record_items("startup", canvas_item_counts(context))
+
+    return zoom_config
+
+def visualize_tree(func, layout="grid", dedupe=False, metrics=None):
+    """
+    Open the call tree recorded on `func`.
+
+    `layout` is "grid" (greedy placement on a grid of columns), "tidy"
+    (compact tidy tree, linear time - best for very large traces) or a
+    function `(parent, call_info) -> TreeLayout`.
+
+    With `dedupe=True` repeated subcalls (same function, args and subtree)
+    are drawn once and labelled with how often they occur; see CallDag.
+
+    `metrics=True` (or a ViewMetrics, or a `callback(kind, name, value)`)
+    times the window's startup phases and interactions; the ViewMetrics
+    is returned once the window is closed. See stacksprout.metrics.
+    """
+    if not hasattr(func, "parent") or not hasattr(func, "call_info"):
+        raise RuntimeError("Function is not traced. Use decorator 'trace'.")
+    if not callable(layout) and layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {tuple(LAYOUTS)} or a callable, got {layout!r}")
+    if not func.parent or not func.call_info:
+        print("No calls were traced. Try running the function.")
+        return
+    if dedupe:
+        func = CallDag(func.parent, func.call_info, getattr(func, "__name__", "trace"))
+        print(func.summary())
+
+    # attempt dpi awareness on Windows (harmless if fails)
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(1)
+    except Exception:
+        pass
+
+    # Create context
+    context = _VisualizationContext()
+    context.metrics = as_metrics(metrics)
+    if context.metrics is not None:
+        opened = context.metrics.clock()
+
+    root = tk.Tk()
+    root.tk.call("tk", "scaling", 1.5)
+    root.title(f"StackSprout - Recursion Tree for {getattr(func, '__name__', 'trace')}")
+
+    # -------------------------
+    # Local layout / style constants (keep them local)
+    # -------------------------
+    cell_offset, diameter = 30, 50
+    context.style["canvas_font_medium"] = tkfont.Font(
+        family="Segoe UI", size=diameter // 5
+    )
+    context.style["canvas_font_small"] = tkfont.Font(
+        family="Segoe UI", size=diameter // 7
+    )
+
+    context.style["bg_color"] = "#f2f2ff"
+
+    context.style["ui_font_medium"] = tkfont.Font(family="Segoe UI", size=10)
+    context.style["base_font_medium"] = context.style["canvas_font_medium"].cget("size")
+    context.style["base_font_small"] = context.style["canvas_font_small"].cget("size")
+
+    canvas_width, canvas_height = 800, 600
+
+    # -------------------------
+    # Fill context and populate shared state
+    # -------------------------
+    context.canvas = tk.Canvas(root, width=canvas_width, height=canvas_height, bg=context.style["bg_color"])
+    zoom_config = build_graph(context, func, layout, diameter, cell_offset, canvas_width, canvas_height)
+
     # -------------------------
     # UI (clean ttk-based)
     # -------------------------
-    build_ui(root, context, context.style["ui_font_medium"])
+    with phase(context, "ui"):
+        build_ui(root, context, context.style["ui_font_medium"])
 
     # keybinds
     bind_keys(root, context, zoom_config)
@@ -161,4 +234,15 @@ def visualize_tree(func):
     # pack canvas
     context.canvas.pack()
 
-    root.mainloop()
\ No newline at end of file
+    if context.metrics is not None:
+        clock = context.metrics.clock
+        shown = clock()
+
+        def first_idle():
+            context.metrics.record_phase("show", clock() - shown)
+            context.metrics.record_phase("total", clock() - opened)
+
+        root.after_idle(first_idle)
+
+    root.mainloop()
+    return context.metrics
\ No newline at end of file